@@ -1,2 +1,13 @@
 from .a3c_model import A3CModel
 from .agent import Agent
+from .epoch_schedule import EpochSchedule
+from .returns import Returns
+from .rollout_buffer import RolloutBuffer
+from .experience_dataset import ExperienceDataset
+from .experience_store import ExperienceStore
+from .weight_broadcast import WeightBroadcast
+from .actor_pool import ActorPool
+from .segment_queue import SegmentQueue
+from .policy import Policy
+from .incremental_policy import IncrementalPolicy
+from .benchmark import Benchmark
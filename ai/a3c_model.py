@@ -6,6 +6,8 @@ import tensorflow as tf
 from tensorflow.keras.models import Model
 from tensorflow.keras.layers import Dense, GRU, LeakyReLU, BatchNormalization, GlobalAveragePooling1D
 
+from .epoch_schedule import EpochSchedule
+
 
 class A3CModel(Model):
     LEARNING_RATE = 5.0e-04
@@ -13,54 +15,105 @@ class A3CModel(Model):
     CLIP_NORM = 1.0
     CLIP_NORM_RISE_FACTOR = 1.1
 
-    def __init__(self, learning_rate=LEARNING_RATE):
+    MIXED_PRECISION_POLICIES = ('mixed_bfloat16', 'mixed_float16')
+
+    def __init__(self, learning_rate=LEARNING_RATE, jit_compile=False, mixed_precision=None):
+        """
+        Args:
+            jit_compile (bool): compile the training functions with XLA.
+            mixed_precision (str): None (float32), 'mixed_bfloat16' or 'mixed_float16' (with loss scaling) -
+                compute dtype of the hidden layers (variables and outputs stay float32).
+        """
         super(A3CModel, self).__init__()
 
-        self.last_epoch = 0
-        self.learning_rate = learning_rate
-        self.clip_norm = self.CLIP_NORM
+        if mixed_precision is not None and mixed_precision not in self.MIXED_PRECISION_POLICIES:
+            raise ValueError(f"Unknown mixed precision policy: {mixed_precision}")
+        self.jit_compile = jit_compile
+        self.mixed_precision = mixed_precision
+        self.loss_scaling = mixed_precision == 'mixed_float16'  # bfloat16 has the float32 range
+        dtype = tf.keras.mixed_precision.Policy(mixed_precision) if mixed_precision else None
+
+        # learning rate decayed by LEARNING_RATE_DECAY_FACTOR ** epoch at the start of every epoch (compounding)
+        self.learning_rate_schedule = EpochSchedule(learning_rate, self.LEARNING_RATE_DECAY_FACTOR, compound=True)
+        self.clip_norm_schedule = EpochSchedule(self.CLIP_NORM, self.CLIP_NORM_RISE_FACTOR,
+                                                epoch=self.learning_rate_schedule.epoch)
+        # the number of traces of the training functions (every retrace increments it)
+        self.trace_count = 0
 
         # GRU Layer
-        self.gru_one = GRU(128, return_sequences=True, return_state=False)
-        self.gru_two = GRU(128, return_sequences=True, return_state=False)
+        self.gru_one = GRU(128, return_sequences=True, return_state=False, dtype=dtype)
+        self.gru_two = GRU(128, return_sequences=True, return_state=False, dtype=dtype)
         # self.gru_thr = GRU(64, return_sequences=True, return_state=False)
         # self.gru_out = GRU(128)
 
-        self.ga_pool = GlobalAveragePooling1D()
+        self.ga_pool = GlobalAveragePooling1D(dtype=dtype)
 
-        self.mid_dense = Dense(128)
-        self.mid_activation = LeakyReLU(alpha=0.1)
-        self.mid_norm = BatchNormalization()
+        self.mid_dense = Dense(128, dtype=dtype)
+        self.mid_activation = LeakyReLU(alpha=0.1, dtype=dtype)
+        self.mid_norm = BatchNormalization(dtype=dtype)
 
-        self.last_dense = Dense(64)
-        self.last_activation = LeakyReLU(alpha=0.2)
-        self.last_norm = BatchNormalization()
+        self.last_dense = Dense(64, dtype=dtype)
+        self.last_activation = LeakyReLU(alpha=0.2, dtype=dtype)
+        self.last_norm = BatchNormalization(dtype=dtype)
 
-        # Actor-Critic output
-        self.actor_dense = Dense(16)
-        self.actor_activation = LeakyReLU(alpha=0.1)
-        self.actor_norm = BatchNormalization()
-        self.actor_out = Dense(1, activation='sigmoid')
+        # Actor-Critic output (always float32 - numerically stable sigmoid and losses)
+        self.actor_dense = Dense(16, dtype=dtype)
+        self.actor_activation = LeakyReLU(alpha=0.1, dtype=dtype)
+        self.actor_norm = BatchNormalization(dtype=dtype)
+        self.actor_out = Dense(1, activation='sigmoid', dtype='float32')
 
-        self.critic_dense = Dense(16)
-        self.critic_activation = LeakyReLU(alpha=0.1)
-        self.critic_norm = BatchNormalization()
-        self.critic_out = Dense(1, activation='linear')
+        self.critic_dense = Dense(16, dtype=dtype)
+        self.critic_activation = LeakyReLU(alpha=0.1, dtype=dtype)
+        self.critic_norm = BatchNormalization(dtype=dtype)
+        self.critic_out = Dense(1, activation='linear', dtype='float32')
 
         # Optimizer
-        self.optimizer = tf.keras.optimizers.Adam(learning_rate=self.learning_rate)
+        self.optimizer = tf.keras.optimizers.Adam(learning_rate=self.learning_rate_schedule)
+        if self.loss_scaling:
+            self.optimizer = tf.keras.mixed_precision.LossScaleOptimizer(self.optimizer)
+
+        # compiled training functions (optionally with XLA)
+        self.train_step = tf.function(self._compiled_train_step, reduce_retracing=True, jit_compile=jit_compile)
+        self.train_steps = tf.function(self._compiled_train_steps, reduce_retracing=True, jit_compile=jit_compile)
+
+    @property
+    def learning_rate(self):
+        return float(self.learning_rate_schedule())
+
+    @property
+    def clip_norm(self):
+        return float(self.clip_norm_schedule())
+
+    def set_epoch(self, epoch: int):
+        """
+        Set the epoch of the learning rate and clip norm schedules (no retracing).
+        """
+        self.learning_rate_schedule.epoch.assign(epoch)
 
     def call(self, inputs):
         # Input Layer
         x = inputs
 
-        x = self.gru_one(x)
+        x = self.encode(x)
+
+        x = self.ga_pool(x)
+
+        return self.head(x)
+
+    def encode(self, inputs):
+        """
+        Recurrent part of the model - sequence of outputs of the last GRU layer.
+        """
+        x = self.gru_one(inputs)
         x = self.gru_two(x)
         # x = self.gru_thr(x)
         # x = self.gru_out(x)
+        return x
 
-        x = self.ga_pool(x)
-
+    def head(self, x):
+        """
+        Dense part of the model (actor and critic outputs) for pooled GRU outputs.
+        """
         x = self.mid_dense(x)
         x = self.mid_norm(x)
         x = self.mid_activation(x)
@@ -111,26 +164,45 @@ class A3CModel(Model):
     def critic_loss(self, true_values, estimated_values):
         return tf.keras.losses.mean_squared_error(true_values, estimated_values)
 
-    @tf.function(reduce_retracing=True)
-    def train_step(self, env_state, actions, advantages, rewards, next_values, epoch=0, gamma=0.98):
-        if epoch != self.last_epoch:
-            self.learning_rate = self.learning_rate * (self.LEARNING_RATE_DECAY_FACTOR ** epoch)
-            self.optimizer.learning_rate.assign(self.learning_rate)
-            self.clip_norm = self.clip_norm * self.CLIP_NORM_RISE_FACTOR
-            self.last_epoch = epoch
-
+    def _train_step(self, env_state, actions, advantages, returns):
         with tf.GradientTape() as tape:
             action_probs, values = self.call(env_state)
 
             actor_loss = self.actor_loss(advantages, actions, action_probs)
 
-            true_values = rewards + gamma * next_values
-            critic_loss = self.critic_loss(tf.squeeze(true_values), tf.squeeze(values))
+            # returns (critic targets) are computed for whole rollout segments (see Returns)
+            critic_loss = self.critic_loss(tf.squeeze(returns), tf.squeeze(values))
 
             total_loss = tf.abs(actor_loss) + tf.abs(critic_loss)
+            loss = self.optimizer.get_scaled_loss(total_loss) if self.loss_scaling else total_loss
 
-        grads = tape.gradient(total_loss, self.trainable_variables)
-        grads, _ = tf.clip_by_global_norm(grads, clip_norm=self.clip_norm)
+        grads = tape.gradient(loss, self.trainable_variables)
+        if self.loss_scaling:
+            grads = self.optimizer.get_unscaled_gradients(grads)
+        grads, _ = tf.clip_by_global_norm(grads, clip_norm=self.clip_norm_schedule())
         self.optimizer.apply_gradients(zip(grads, self.trainable_variables))
 
         return actor_loss, critic_loss, total_loss
+
+    def _compiled_train_step(self, env_state, actions, advantages, returns):
+        """
+        One training step (compiled as train_step).
+        """
+        self.trace_count += 1  # Python side effect - runs only while tracing
+        return self._train_step(env_state, actions, advantages, returns)
+
+    def _compiled_train_steps(self, env_states, actions, advantages, returns):
+        """
+        Several training steps in one call, compiled as train_steps (tf.while_loop over minibatches stacked
+        on the first axis, e.g. from ExperienceDataset with steps_per_execution).
+
+        Returns:
+            mean actor, critic and total losses of the steps
+        """
+        self.trace_count += 1  # Python side effect - runs only while tracing
+        steps = tf.shape(env_states)[0]
+        losses = tf.zeros([3])
+        for step in tf.range(steps):
+            losses += tf.stack(self._train_step(env_states[step], actions[step], advantages[step], returns[step]))
+        losses /= tf.cast(steps, tf.float32)
+        return losses[0], losses[1], losses[2]
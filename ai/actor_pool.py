@@ -0,0 +1,54 @@
+import multiprocessing as mp
+
+from .agent import Agent
+
+
+class ActorPool:
+    """
+    Long-lived agents (processes) that stay warm across epochs.
+    Every agent builds its model once, then for every published weights version runs one rollout
+    (Agent.EXP_COUNTER steps) into the shared RolloutBuffer and waits for the next version.
+    With worker=Agent.async_actor_worker (and SegmentQueue as rollout_buffer) agents stream segments
+    continuously instead.
+
+    Attributes:
+        agents_desired_temps (list): desired temperatures of rooms (one list per agent).
+        weight_broadcast (WeightBroadcast): weights published by the learner.
+        rollout_buffer (RolloutBuffer): experiences written by the agents.
+        processes (list): agents processes.
+    """
+    def __init__(self, agents_desired_temps: list, weight_broadcast, rollout_buffer, worker=Agent.actor_worker):
+        self.agents_desired_temps = agents_desired_temps
+        self.worker = worker
+        self.weight_broadcast = weight_broadcast
+        self.rollout_buffer = rollout_buffer
+        self.stop_event = mp.Event()
+        self.processes = []
+
+    def start(self):
+        for agent_id, desired_temps in enumerate(self.agents_desired_temps):
+            print("Creating Agent ", agent_id)
+            process = mp.Process(target=self.worker,
+                                 args=(agent_id, self.weight_broadcast, self.rollout_buffer, desired_temps,
+                                       self.stop_event))
+            self.processes.append(process)
+            process.start()
+
+    def run_epoch(self, weights):
+        """
+        Start the next rollout of all agents with given weights (wait for it with rollout_buffer.wait()).
+        """
+        self.rollout_buffer.clear()
+        return self.weight_broadcast.publish(weights)
+
+    def is_alive(self):
+        return any(process.is_alive() for process in self.processes)
+
+    def stop(self, timeout=60):
+        self.stop_event.set()
+        self.weight_broadcast.notify()
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self.processes = []
@@ -1,3 +1,4 @@
+import multiprocessing as mp
 import os
 
 os.environ['TF_GPU_ALLOCATOR'] = 'cuda_malloc_async'
@@ -8,15 +9,21 @@ import tensorflow as tf
 from matplotlib import pyplot as plt
 
 from .a3c_model import A3CModel
+from .experience_dataset import ExperienceDataset
+from .returns import Returns
 from main import Environment as Env
-from setup import ai
 
 
 class Agent:
     EXP_COUNTER = 4000  # how many experiences (actions in environment) 1440 = day
     SAVE_DIR = './saves/'
     SAVE_FILE = 'a3c_model'
+    EXPERIENCE_DIR = './data/experiences/'
     BATCH_COUNT = 40
+    STEPS_PER_EXECUTION = 10  # training steps (batches) in one call of the compiled training loop
+    SEGMENT_LEN = 100  # environment steps collected before they are written to the buffer
+    GAMMA = 0.98
+    GAE_LAMBDA = 0.95
 
     @staticmethod
     def check_save_dir(save_dir=SAVE_DIR):
@@ -71,122 +78,185 @@ class Agent:
 
     @staticmethod
     def unpack_exp_and_step(model, experiences, epoch=0):
-        states, actions, advantages, rewards, next_val = zip(*experiences)
-
-        actions = np.array(actions)
-        advantages = np.array(advantages)
-        rewards = np.array(rewards)
-        next_val = np.array(next_val)
-        states = np.array(states)
-
-        actions = actions.reshape(-1, 1).astype(np.float32)
-        advantages = advantages.reshape(-1, 1).astype(np.float32)
-        rewards = rewards.reshape(-1, 1).astype(np.float32)
-        next_val = next_val.reshape(-1, 1).astype(np.float32)
-
-        if ai['DEBUG']:
-            Agent.save_exp_to_csv(actions, advantages, rewards, next_val, epoch)
-
-        states = states.reshape(-1, states.shape[-2], states.shape[-1])
-
-        if ai['DEBUG']:
-            Agent.save_states_to_csv(states, epoch)
-
-        # create training batches
-        dim = len(actions)
-        shuffled_indices = np.random.permutation(dim)
-        shuffled_actions = actions[shuffled_indices]
-        shuffled_advantages = advantages[shuffled_indices]
-        shuffled_rewards = rewards[shuffled_indices]
-        shuffled_next_val = next_val[shuffled_indices]
-        shuffled_states = states[shuffled_indices]
-        split_actions = np.array_split(shuffled_actions, Agent.BATCH_COUNT)
-        split_advantages = np.array_split(shuffled_advantages, Agent.BATCH_COUNT)
-        split_rewards = np.array_split(shuffled_rewards, Agent.BATCH_COUNT)
-        split_next_val = np.array_split(shuffled_next_val, Agent.BATCH_COUNT)
-        split_states = np.array_split(shuffled_states, Agent.BATCH_COUNT)
-
-        actor_loss, critic_loss, total_loss = [], [], []
-        for env_state, actions, advantages, rewards, next_val in zip(split_states, split_actions, split_advantages,
-                                                                    split_rewards, split_next_val):
-            # ##################################
-            # action_probs, values = model.call(env_state)
-            # action_probs = tf.clip_by_value(action_probs, 1e-8, 1 - 1e-8)
-            #
-            # log_probs = tf.math.log(action_probs)
-            # log_probs_neg = tf.math.log(1 - action_probs)
-            #
-            # selected_log_probs = actions * log_probs + (1 - actions) * log_probs_neg
-            #
-            # entropy = -(action_probs * log_probs + (1 - action_probs) * log_probs_neg)
-            # mean_entropy = tf.reduce_mean(entropy)
-            #
-            # policy_loss = -tf.reduce_mean(selected_log_probs * advantages)  # minus for maximization
-            # loss = policy_loss + 0.98 * mean_entropy
-            # ###################################
-
-            a, c, t = model.train_step(env_state, actions, advantages, rewards, next_val, epoch)
+        """
+        Args:
+            experiences: tuple of arrays (states, actions, advantages, rewards, returns) e.g. from RolloutBuffer
+                or ExperienceStore.replay()
+        """
+        # training batches are gathered from the buffer (shuffled) while the previous batches are trained
+        dataset = ExperienceDataset(experiences, Agent.BATCH_COUNT, Agent.STEPS_PER_EXECUTION).build()
+        model.set_epoch(epoch)
+
+        # ##################################
+        # action_probs, values = model.call(env_state)
+        # action_probs = tf.clip_by_value(action_probs, 1e-8, 1 - 1e-8)
+        #
+        # log_probs = tf.math.log(action_probs)
+        # log_probs_neg = tf.math.log(1 - action_probs)
+        #
+        # selected_log_probs = actions * log_probs + (1 - actions) * log_probs_neg
+        #
+        # entropy = -(action_probs * log_probs + (1 - action_probs) * log_probs_neg)
+        # mean_entropy = tf.reduce_mean(entropy)
+        #
+        # policy_loss = -tf.reduce_mean(selected_log_probs * advantages)  # minus for maximization
+        # loss = policy_loss + 0.98 * mean_entropy
+        # ###################################
+
+        actor_loss, critic_loss, total_loss, steps = [], [], [], []
+        for env_states, actions, advantages, returns in dataset:
+            a, c, t = model.train_steps(env_states, actions, advantages, returns)
             actor_loss.append(a)
             critic_loss.append(c)
             total_loss.append(t)
-        return np.mean(actor_loss), np.mean(critic_loss), np.mean(total_loss)
+            steps.append(len(env_states))
+        return (np.average(actor_loss, weights=steps), np.average(critic_loss, weights=steps),
+                np.average(total_loss, weights=steps))
 
     @staticmethod
-    def learn(agent_id, model_weights_queue, experience_queue, desired_temps, gamma=0.98):
-        model = A3CModel()
-        env = Env(desired_temps)
+    def start_rollout(model, env):
+        """
+        Reset the environment and evaluate the first observation.
+
+        Returns:
+            carry - tuple of (states, actions, values) for rollout_segment()
+        """
         states = env.reset()
-        # lazy build
-        model(tf.convert_to_tensor(states, dtype=tf.float32))
-        new_weights = model_weights_queue.get(timeout=60)
-        model.set_weights(new_weights)
+        return (states, *Agent.choose_action(states, model, True))
+
+    @staticmethod
+    def rollout_segment(model, env, carry, segment_len, gamma=GAMMA, lam=GAE_LAMBDA):
+        """
+        segment_len environment steps with one forward pass per step - actions and values come from the same
+        pass and the values of the next observation are the bootstrap targets of the previous step.
+        Advantages and returns (GAE, see Returns) are computed once for the whole segment.
+
+        Args:
+            carry: tuple of (states, actions, values) of the actual observation (start_rollout() or previous segment)
+        Returns:
+            (experiences, carry) - experiences is tuple of arrays (segment_len, rooms, ...) of
+            (states, actions, advantages, rewards, returns)
+        """
+        states, actions, values = carry
+        seg_states = np.empty((segment_len, *states.shape), dtype=np.float32)
+        seg_actions, seg_values, seg_rewards, seg_next_values = (np.empty((segment_len, len(states)), dtype=np.float32)
+                                                                 for _ in range(4))
+        for step in range(segment_len):
+            # the observation is a view of the environment history - it has to be copied before the next steps
+            seg_states[step] = states
+            seg_actions[step] = actions.reshape(-1)
+            seg_values[step] = values.reshape(-1)
+
+            states, rewards = env.step(actions, 1)  # one (1) or rebuild environment step()
+            actions, values = Agent.choose_action(states, model, True)
+
+            seg_rewards[step] = rewards.reshape(-1)
+            seg_next_values[step] = values.reshape(-1)
+
+        advantages, returns = Returns.gae(seg_rewards, seg_values, seg_next_values, gamma, lam)
+        return (seg_states, seg_actions, advantages, seg_rewards, returns), (states, actions, values)
+
+    @staticmethod
+    def learn(agent_id, model, rollout_buffer, desired_temps, gamma=GAMMA):
+        """
+        One rollout (Agent.EXP_COUNTER steps in a new environment) written to the agent's part of rollout_buffer
+        in segments of Agent.SEGMENT_LEN steps.
+        """
+        env = Env(desired_temps)
+        carry = Agent.start_rollout(model, env)
 
         episode = 0
         while episode < Agent.EXP_COUNTER:
-            actions, values = Agent.choose_action(states, model, True)
-            next_states, rewards = env.step(actions, 1)  # one (1) or rebuild environment step()
-            _, next_values = Agent.choose_action(next_states, model, True)
+            segment_len = min(Agent.SEGMENT_LEN, Agent.EXP_COUNTER - episode)
+            experiences, carry = Agent.rollout_segment(model, env, carry, segment_len, gamma)
+            rollout_buffer.write_segment(agent_id, *experiences)
+            episode += segment_len
 
-            rewards = rewards.reshape((-1, 1))
-            target_value = rewards + next_values * gamma
-            advantages = target_value - values
+        rollout_buffer.set_done(agent_id)
 
-            experience = (states, actions, advantages, rewards, next_values)
-            experience_queue.put(experience)  # ((agent_id, experience))
-            states = next_states
-            episode += 1
+    @staticmethod
+    def actor_worker(agent_id, weight_broadcast, rollout_buffer, desired_temps, stop_event, wait_timeout=60):
+        """
+        Long-lived agent process (see ActorPool). The model is built once and every new weights version
+        published by the learner starts the next rollout.
+        """
+        model = A3CModel()
+        states = Env(desired_temps).reset()
+        # lazy build
+        model(tf.convert_to_tensor(states, dtype=tf.float32))
 
+        version = 0
+        while not stop_event.is_set():
+            new_version = weight_broadcast.wait_for_version(version, timeout=wait_timeout)
+            if stop_event.is_set() or not mp.parent_process().is_alive():
+                break
+            if new_version == version:
+                continue  # timeout - check if the learner is still alive
+            weights, version = weight_broadcast.read()
+            model.set_weights(weights)
+            Agent.learn(agent_id, model, rollout_buffer, desired_temps)
+
+        rollout_buffer.close()
+        weight_broadcast.close()
         tf.keras.backend.clear_session()
 
     @staticmethod
-    def save_states_to_csv(states, epoch, output_dir='data'):
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-        states = states.reshape(-1, states.shape[-1])
-        exp_df = pd.DataFrame(states)
-        file = os.path.join(output_dir, f'states{epoch}.csv')
-        # save to file
-        exp_df.to_csv(file, index=False)
+    def async_actor_worker(agent_id, weight_broadcast, segment_queue, desired_temps, stop_event, gamma=GAMMA,
+                           wait_timeout=60):
+        """
+        Long-lived agent process for asynchronous training (see ActorPool and SegmentQueue).
+        The agent streams segments without waiting for the learner (only for a free slot) and picks up
+        the newest published weights at the beginning of every segment.
+        """
+        model = A3CModel()
+        env = Env(desired_temps)
+        states = env.reset()
+        # lazy build
+        model(tf.convert_to_tensor(states, dtype=tf.float32))
 
-    @staticmethod
-    def save_exp_to_csv(actions, advantages, rewards, next_val, epoch, output_dir='data'):
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
+        version = 0
+        while version == 0 and not stop_event.is_set() and mp.parent_process().is_alive():
+            version = weight_broadcast.wait_for_version(version, timeout=wait_timeout)
+        if version > 0:
+            weights, version = weight_broadcast.read()
+            model.set_weights(weights)
 
-        actions = actions.reshape(-1).astype(np.float32)
-        advantages = advantages.reshape(-1).astype(np.float32)
-        rewards = rewards.reshape(-1).astype(np.float32)
-        next_val = next_val.reshape(-1).astype(np.float32)
+        carry = Agent.start_rollout(model, env)
+        episode = 0
+        while not stop_event.is_set():
+            if not segment_queue.wait_for_free_slot(agent_id, stop_event):
+                break
+            if weight_broadcast.get_version() > version:
+                weights, version = weight_broadcast.read()
+                model.set_weights(weights)
+                # the whole segment (with its first step) is collected with the new weights
+                carry = (carry[0], *Agent.choose_action(carry[0], model, True))
+
+            experiences, carry = Agent.rollout_segment(model, env, carry, segment_queue.segment_len, gamma)
+            segment_queue.write_segment(agent_id, *experiences)
+            segment_queue.publish_segment(agent_id, version)
+
+            episode += segment_queue.segment_len
+            if episode >= Agent.EXP_COUNTER:  # new environment (new random offset) from time to time
+                env = Env(desired_temps)
+                carry = Agent.start_rollout(model, env)
+                episode = 0
+
+        segment_queue.close()
+        weight_broadcast.close()
+        tf.keras.backend.clear_session()
 
-        exp_df = pd.DataFrame({
-            'Action': actions,
-            'Advantages': advantages,
-            'Rewards': rewards,
-            'Next Value': next_val
-        })
-        file = os.path.join(output_dir, f'exp{epoch}.csv')
-        # save to file
-        exp_df.to_csv(file, index=False)
+    @staticmethod
+    def train_on_segment(model, experiences, epoch=0):
+        """
+        One training step on one segment (e.g. from SegmentQueue.get_segment()).
+        """
+        states, actions, advantages, _, returns = experiences
+        actions, advantages, returns = (values.reshape(-1, 1).astype(np.float32)
+                                        for values in (actions, advantages, returns))
+        model.set_epoch(epoch)
+        a, c, t = model.train_step(states, actions, advantages, returns)
+        return float(a), float(c), float(t)
 
     @staticmethod
     def save_losses_csv(actor_losses, critic_losses, total_losses, output_dir='data/losses'):
@@ -0,0 +1,139 @@
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from .a3c_model import A3CModel
+from .agent import Agent
+from .policy import Policy
+from .incremental_policy import IncrementalPolicy
+from main import Environment
+
+
+class Benchmark:
+    """
+    Helper class to measure performance of different execution paths of the model.
+    """
+    @staticmethod
+    def measure(function, repeats=200, warmup=5):
+        """
+        Returns:
+            (float, float): median and mean time of one call in milliseconds.
+        """
+        for _ in range(warmup):
+            function()
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            function()
+            times.append((time.perf_counter() - start) * 1000)
+        return float(np.median(times)), float(np.mean(times))
+
+    @staticmethod
+    def inference(model, states, repeats=200):
+        """
+        Compare latency of one control decision: eager Keras call vs compiled Policy.
+
+        Args:
+            model (A3CModel): built model.
+            states (np.ndarray): (rooms, window, features) observation.
+        Returns:
+            dict: {path: (median ms, mean ms)}
+        """
+        policy = Policy(model, states.shape[-2], states.shape[-1])
+        eager_actions = np.asarray(Agent.choose_simulation_all_action(states, model, False))
+        if not np.array_equal(eager_actions, policy.choose_actions(states)):
+            print("Warning: compiled policy returned different actions than the eager model")
+        return {
+            'eager': Benchmark.measure(lambda: Agent.choose_simulation_all_action(states, model, False), repeats),
+            'compiled': Benchmark.measure(lambda: policy.choose_actions(states), repeats),
+        }
+
+    @staticmethod
+    def incremental(model, env, steps=500):
+        """
+        Run the environment with the compiled full-window Policy and compare every decision (latency and action)
+        with IncrementalPolicy fed with the same observations.
+
+        Args:
+            model (A3CModel): built model.
+            env (Environment): environment (it is reset).
+        Returns:
+            dict: {path: (median ms, mean ms)} and the fraction of equal actions.
+        """
+        states = env.reset()
+        policy = Policy(model, states.shape[-2], states.shape[-1])
+        incremental = IncrementalPolicy(model, states.shape[-1], env.history_phases, env.history_window)
+        incremental.reset(states)
+        full_times, incremental_times, equal = [], [], []
+        for _ in range(steps):
+            start = time.perf_counter()
+            actions = policy.choose_actions(states)
+            full_times.append((time.perf_counter() - start) * 1000)
+            states, _ = env.step(actions, 1)
+
+            start = time.perf_counter()
+            incremental_actions = incremental.step(states, env.get_time() % env.history_phases)
+            incremental_times.append((time.perf_counter() - start) * 1000)
+            equal.append(np.array_equal(incremental_actions, policy.choose_actions(states)))
+        return {
+            'compiled': (float(np.median(full_times)), float(np.mean(full_times))),
+            'incremental': (float(np.median(incremental_times)), float(np.mean(incremental_times))),
+        }, float(np.mean(equal))
+
+    @staticmethod
+    def training(configs, desired_temps, epochs=4, rollout_steps=1000, eval_steps=1440, seed=0):
+        """
+        Short in-process training (one agent, the same initial weights and seeds) of every model configuration.
+        The first epoch (tracing / XLA compilation) is not timed.
+
+        Args:
+            configs (dict): {name: A3CModel keyword arguments} e.g. {'default': {}, 'xla': {'jit_compile': True}}.
+            desired_temps (list): desired temperatures of the rooms.
+        Returns:
+            dict: {name: (training steps per second, mean reward of the trained policy over eval_steps)}
+        """
+        results = {}
+        weights = None
+        for name, options in configs.items():
+            np.random.seed(seed)
+            tf.random.set_seed(seed)
+            model = A3CModel(**options)
+            env = Environment(desired_temps)
+            model(env.reset())  # lazy build (no action sampling - the random streams stay the same for all configs)
+            if weights is None:
+                weights = model.get_weights()
+            else:
+                model.set_weights(weights)
+            carry = Agent.start_rollout(model, env)
+
+            train_time, train_steps = 0., 0
+            for epoch in range(epochs):
+                experiences, carry = Agent.rollout_segment(model, env, carry, rollout_steps)
+                experiences = tuple(values.reshape(-1, *values.shape[2:]) for values in experiences)
+                start = time.perf_counter()
+                Agent.unpack_exp_and_step(model, experiences, epoch)
+                if epoch > 0 or epochs == 1:
+                    train_time += time.perf_counter() - start
+                    train_steps += Agent.BATCH_COUNT
+
+            states = env.reset()
+            policy = Policy(model, states.shape[-2], states.shape[-1])
+            rewards = []
+            for _ in range(eval_steps):
+                states, reward = env.step(policy.choose_actions(states), 1)
+                rewards.append(np.mean(reward))
+            results[name] = (train_steps / train_time, float(np.mean(rewards)))
+        return results
+
+    @staticmethod
+    def print_training_results(title, results):
+        print(title)
+        for name, (steps_per_second, reward) in results.items():
+            print(f"  {name:>16}: {steps_per_second:8.2f} steps/s, reward {reward:10.4f}")
+
+    @staticmethod
+    def print_results(title, results):
+        print(title)
+        for path, (median, mean) in results.items():
+            print(f"  {path:>12}: median {median:8.3f} ms, mean {mean:8.3f} ms")
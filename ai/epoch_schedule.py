@@ -0,0 +1,32 @@
+import os
+
+os.environ['TF_GPU_ALLOCATOR'] = 'cuda_malloc_async'
+
+import tensorflow as tf
+
+
+class EpochSchedule(tf.keras.optimizers.schedules.LearningRateSchedule):
+    """
+    Value changed by `factor` at the start of every epoch, evaluated in the graph from the epoch variable
+    (the optimizer step is ignored), so changing the epoch never retraces the training step.
+
+    compound=False: initial * factor ** e
+    compound=True:  initial * factor ** (e * (e + 1) / 2) - multiplied by factor ** e at the start of epoch e
+
+    Attributes:
+        epoch (tf.Variable): actual epoch (int64), shared by schedules created with the same variable.
+    """
+    def __init__(self, initial_value: float, factor: float, compound: bool = False, epoch=None):
+        super(EpochSchedule, self).__init__()
+        self.initial_value = initial_value
+        self.factor = factor
+        self.compound = compound
+        self.epoch = tf.Variable(0, dtype=tf.int64, trainable=False) if epoch is None else epoch
+
+    def __call__(self, step=None):
+        epoch = tf.cast(self.epoch, tf.float32)
+        exponent = epoch * (epoch + 1.) / 2. if self.compound else epoch
+        return self.initial_value * tf.pow(tf.constant(self.factor, tf.float32), exponent)
+
+    def get_config(self):
+        return {'initial_value': self.initial_value, 'factor': self.factor, 'compound': self.compound}
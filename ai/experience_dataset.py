@@ -0,0 +1,71 @@
+import os
+
+os.environ['TF_GPU_ALLOCATOR'] = 'cuda_malloc_async'
+
+import numpy as np
+import tensorflow as tf
+
+
+class ExperienceDataset:
+    """
+    Training input pipeline over experiences kept in float32 arrays (e.g. views of RolloutBuffer
+    or memory-mapped shards from ExperienceStore.replay()).
+    Only the shuffled indices go through tf.data - every batch is gathered from the arrays on the host
+    (no copy of the whole epoch) and prefetched, so preparing the next batch overlaps with the gradient step.
+    All batches have the same shape (batch_size = n // batch_count, the remaining experiences are left out
+    of the pass), `steps_per_execution` batches are stacked on the first axis for A3CModel.train_steps.
+
+    Attributes:
+        states (np.ndarray): (n, window, features) float32.
+        actions, advantages, returns (np.ndarray): (n,) float32.
+        batch_count (int): the number of batches in one pass.
+        batch_size (int): the number of experiences in one batch.
+        steps_per_execution (int): the number of batches in one element of the dataset.
+    """
+    def __init__(self, experiences, batch_count: int = 40, steps_per_execution: int = 1,
+                 prefetch: int = tf.data.AUTOTUNE):
+        """
+        Args:
+            experiences: tuple of arrays (states, actions, advantages, rewards, returns) e.g. from RolloutBuffer
+        """
+        self.states, self.actions, self.advantages, _, self.returns = experiences
+        self.batch_count = min(batch_count, len(self.actions))
+        self.batch_size = len(self.actions) // self.batch_count
+        self.steps_per_execution = steps_per_execution
+        self.prefetch = prefetch
+
+    def __len__(self):
+        return -(-self.batch_count // self.steps_per_execution)
+
+    def _gather(self, indices):
+        """
+        Args:
+            indices (np.ndarray): (steps, batch_size) indices of experiences.
+        """
+        indices = np.sort(indices, axis=-1)  # sequential reads from the buffer
+        columns = (self.actions, self.advantages, self.returns)
+        return (np.asarray(self.states[indices], dtype=np.float32),
+                *(np.asarray(column[indices][..., np.newaxis], dtype=np.float32) for column in columns))
+
+    def build(self, seed=None):
+        """
+        Returns:
+            tf.data.Dataset of (states, actions, advantages, returns) - (steps, batch_size, ...) stacked batches
+            (one pass in a new random order).
+        """
+        order = np.random.default_rng(seed).permutation(len(self.actions))
+        order = order[:self.batch_count * self.batch_size].reshape(self.batch_count, self.batch_size)
+        steps = self.steps_per_execution
+
+        def load(first):
+            states, actions, advantages, returns = tf.numpy_function(
+                lambda f: self._gather(order[f:f + steps]), [first],
+                [tf.float32, tf.float32, tf.float32, tf.float32])
+            states.set_shape([None, self.batch_size, *self.states.shape[1:]])
+            for column in (actions, advantages, returns):
+                column.set_shape([None, self.batch_size, 1])
+            return states, actions, advantages, returns
+
+        return (tf.data.Dataset.range(0, self.batch_count, steps)
+                .map(load, num_parallel_calls=tf.data.AUTOTUNE, deterministic=True)
+                .prefetch(self.prefetch))
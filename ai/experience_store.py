@@ -0,0 +1,126 @@
+import json
+import os
+
+import numpy as np
+
+
+class ConcatenatedArray:
+    """
+    Read-only concatenation of arrays (e.g. memory-mapped shards) along the first axis without copying them.
+    Indexing with an integer array gathers rows from the shards (the result is a new in-memory array).
+    """
+    def __init__(self, arrays):
+        self.arrays = list(arrays)
+        self.offsets = np.cumsum([0] + [len(array) for array in self.arrays])
+        self.shape = (int(self.offsets[-1]), *self.arrays[0].shape[1:])
+        self.dtype = self.arrays[0].dtype
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, indices):
+        indices = np.asarray(indices)
+        flat = indices.reshape(-1)
+        shards = np.searchsorted(self.offsets, flat, side='right') - 1
+        result = np.empty((len(flat), *self.shape[1:]), dtype=self.dtype)
+        for shard in np.unique(shards):
+            selected = shards == shard
+            result[selected] = self.arrays[shard][flat[selected] - self.offsets[shard]]
+        return result.reshape(*indices.shape, *self.shape[1:])
+
+
+class ExperienceStore:
+    """
+    On-disk experience dataset - one shard (directory of .npy files, one per field) per stored rollout
+    and a JSON manifest with the list of shards. Shards are opened memory-mapped, so past epochs can be
+    replayed, shuffled and mixed (see ExperienceDataset) without loading them into RAM.
+
+    Layout:
+        <directory>/manifest.json - {"version": 1, "shards": [{"name", "epoch", "rows", "window", "features"}]}
+        <directory>/<name>/states.npy - (rows, window, features) float32
+        <directory>/<name>/{actions,advantages,rewards,returns}.npy - (rows,) float32
+
+    Attributes:
+        directory (str): root directory of the store.
+        shards (list): manifest entries of all stored shards.
+    """
+    MANIFEST = 'manifest.json'
+    VERSION = 1
+    FIELDS = ('states', 'actions', 'advantages', 'rewards', 'returns')
+    DTYPE = np.float32
+
+    def __init__(self, directory: str = 'data/experiences'):
+        self.directory = directory
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        manifest = os.path.join(directory, self.MANIFEST)
+        if os.path.exists(manifest):
+            with open(manifest) as f:
+                self.shards = json.load(f)['shards']
+        else:
+            self.shards = []
+
+    def _write_manifest(self):
+        manifest = os.path.join(self.directory, self.MANIFEST)
+        with open(manifest + '.tmp', 'w') as f:
+            json.dump({'version': self.VERSION, 'shards': self.shards}, f, indent=1)
+        os.replace(manifest + '.tmp', manifest)  # readers never see a partly written manifest
+
+    def save(self, experiences, epoch: int, name: str = None):
+        """
+        Write experiences (tuple of arrays (states, actions, advantages, rewards, returns) e.g. from RolloutBuffer)
+        as a new shard (by default named by its number - the same epoch can be stored by many runs).
+
+        Returns:
+            str: name of the shard.
+        """
+        name = name or f'shard_{len(self.shards):05d}'
+        if any(shard['name'] == name for shard in self.shards):
+            raise ValueError(f"Shard already exists: {name}")
+        shard_dir = os.path.join(self.directory, name)
+        os.makedirs(shard_dir)
+        states = experiences[0]
+        for field, values in zip(self.FIELDS, experiences):
+            values = values.reshape(-1, *states.shape[-2:]) if field == 'states' else values.reshape(-1)
+            np.save(os.path.join(shard_dir, field + '.npy'), values.astype(self.DTYPE, copy=False))
+
+        self.shards.append({'name': name, 'epoch': int(epoch), 'rows': int(np.prod(states.shape[:-2])),
+                            'window': int(states.shape[-2]), 'features': int(states.shape[-1])})
+        self._write_manifest()
+        return name
+
+    def load(self, name: str):
+        """
+        Returns:
+            tuple of memory-mapped arrays (states, actions, advantages, rewards, returns) of one shard
+        """
+        shard_dir = os.path.join(self.directory, name)
+        return tuple(np.load(os.path.join(shard_dir, field + '.npy'), mmap_mode='r') for field in self.FIELDS)
+
+    def select(self, epochs=None, last: int = None):
+        """
+        Returns:
+            list of shard names of given epochs (all by default), optionally only the last ones
+        """
+        names = [shard['name'] for shard in self.shards if epochs is None or shard['epoch'] in epochs]
+        return names[-last:] if last else names
+
+    def replay(self, names=None):
+        """
+        Experiences of many shards as one dataset (no copy - rows are gathered from memory-mapped shards).
+
+        Args:
+            names (list): shard names (all shards by default, see select()).
+        Returns:
+            tuple of (states, actions, advantages, rewards, returns) - e.g. for Agent.unpack_exp_and_step()
+        """
+        names = self.select() if names is None else names
+        if not names:
+            raise ValueError(f"No experiences in {self.directory}")
+        shards = [self.load(name) for name in names]
+        if len(shards) == 1:
+            return shards[0]
+        return tuple(ConcatenatedArray(arrays) for arrays in zip(*shards))
+
+    def get_rows(self):
+        return sum(shard['rows'] for shard in self.shards)
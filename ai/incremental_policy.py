@@ -0,0 +1,108 @@
+import os
+
+os.environ['TF_GPU_ALLOCATOR'] = 'cuda_malloc_async'
+
+import numpy as np
+import tensorflow as tf
+
+
+class IncrementalPolicy:
+    """
+    Stateful inference of the trained A3CModel - one new state vector per control decision.
+
+    The environment keeps `phases` interleaved windows (one per `time % phases`) and every step appends only
+    one vector to one of them. Instead of running both GRU layers over the whole window, this policy keeps
+    (per phase and room) the GRU hidden states and a ring of the last `window` outputs of the second GRU layer.
+    A step runs the GRU cells on the new vector only and averages the ring (GlobalAveragePooling1D),
+    so the recurrent compute per decision is `window` times smaller.
+
+    After reset() the hidden states are exactly the ones of the full model. Later the hidden states carry
+    the history from before the window (the full model starts every window from zero state), so outputs
+    are close to, but not bit-identical with, the full model (see Benchmark.incremental).
+
+    Attributes:
+        model (A3CModel): trained (built) model.
+        phases (int): the number of interleaved windows.
+        window (int): the number of state vectors in one window.
+        hidden_one, hidden_two (np.ndarray): (phases, rooms, units) GRU hidden states.
+        outputs (np.ndarray): (phases, rooms, window, units) ring of the last GRU outputs.
+        heads (np.ndarray): (phases,) index of the oldest output in the ring.
+        steps (int): the number of steps since reset.
+    """
+    def __init__(self, model, features: int, phases: int = 10, window: int = 42):
+        self.model = model
+        self.phases = phases
+        self.window = window
+        self.hidden_one = self.hidden_two = self.outputs = None
+        self.heads = np.zeros(phases, dtype=np.int64)
+        self.steps = 0
+
+        units_one = model.gru_one.cell.units
+        units_two = model.gru_two.cell.units
+        self._encode = tf.function(self.model.encode,
+                                   input_signature=[tf.TensorSpec([None, window, features], tf.float32)])
+        self._cells = tf.function(self._cells_step,
+                                  input_signature=[tf.TensorSpec([None, features], tf.float32),
+                                                   tf.TensorSpec([None, units_one], tf.float32),
+                                                   tf.TensorSpec([None, units_two], tf.float32)])
+        self._head = tf.function(self._head_step, input_signature=[tf.TensorSpec([None, units_two], tf.float32)])
+
+    def _cells_step(self, states, hidden_one, hidden_two):
+        hidden_one, _ = self.model.gru_one.cell(states, [hidden_one], training=False)
+        hidden_two, _ = self.model.gru_two.cell(hidden_one, [hidden_two], training=False)
+        return hidden_one, hidden_two
+
+    def _head_step(self, pooled):
+        action_probs, values = self.model.head(pooled)
+        return tf.where(action_probs > 0.5, 1, 0), values
+
+    def reset(self, states):
+        """
+        Initialize all phases with the full model pass over the first observation (e.g. Environment.reset()).
+
+        Args:
+            states (np.ndarray): (rooms, window, features) observation.
+        Returns:
+            np.ndarray (rooms, 1) of actions
+        """
+        states = tf.convert_to_tensor(states, dtype=tf.float32)
+        sequence_two = self._encode(states).numpy()
+        sequence_one = self.model.gru_one(states, training=False).numpy()
+        self.hidden_one = np.repeat(sequence_one[np.newaxis, :, -1], self.phases, axis=0)
+        self.hidden_two = np.repeat(sequence_two[np.newaxis, :, -1], self.phases, axis=0)
+        self.outputs = np.repeat(sequence_two[np.newaxis], self.phases, axis=0)
+        self.heads[:] = 0
+        self.steps = 0
+        actions, _ = self._head(tf.convert_to_tensor(sequence_two.mean(axis=1)))
+        return actions.numpy()
+
+    def step(self, new_states, phase=None):
+        """
+        One control decision for the new state vectors.
+
+        Args:
+            new_states (np.ndarray): (rooms, features) newest state vectors (or (rooms, window, features)
+                observation - only the last vector is used).
+            phase (int): window index (time % phases), by default counted from reset() (one minute steps).
+        Returns:
+            np.ndarray (rooms, 1) of actions
+        """
+        new_states = np.asarray(new_states)
+        if new_states.ndim == 3:
+            new_states = new_states[:, -1]
+        new_states = new_states.astype(np.float32)
+        self.steps += 1
+        if phase is None:
+            phase = self.steps % self.phases
+
+        hidden_one, hidden_two = self._cells(tf.convert_to_tensor(new_states),
+                                             tf.convert_to_tensor(self.hidden_one[phase]),
+                                             tf.convert_to_tensor(self.hidden_two[phase]))
+        self.hidden_one[phase] = hidden_one.numpy()
+        self.hidden_two[phase] = hidden_two.numpy()
+        # the oldest output is replaced with the newest one
+        self.outputs[phase, :, self.heads[phase]] = self.hidden_two[phase]
+        self.heads[phase] = (self.heads[phase] + 1) % self.window
+
+        actions, _ = self._head(tf.convert_to_tensor(self.outputs[phase].mean(axis=1)))
+        return actions.numpy()
@@ -0,0 +1,56 @@
+import os
+
+os.environ['TF_GPU_ALLOCATOR'] = 'cuda_malloc_async'
+
+import tensorflow as tf
+
+
+class Policy(tf.Module):
+    """
+    Compiled inference of the trained A3CModel (for simulator, silent mode or a real thermostat loop).
+    The forward pass is traced once as a tf.function with fixed input signature (any number of rooms),
+    so every control decision runs the graph without eager Keras dispatch and without retracing
+    (optionally compiled with XLA - jit_compile=True, by default model.jit_compile).
+
+    Attributes:
+        model (A3CModel): trained (built) model.
+        window (int): the number of state vectors in one observation.
+        features (int): length of one state vector.
+    """
+    def __init__(self, model, window: int, features: int, jit_compile=None):
+        super(Policy, self).__init__()
+        self.model = model
+        self.window = window
+        self.features = features
+        if jit_compile is None:
+            jit_compile = getattr(model, 'jit_compile', False)
+        self.predict = tf.function(self._predict,
+                                   input_signature=[tf.TensorSpec([None, window, features], tf.float32)],
+                                   jit_compile=jit_compile)
+
+    def _predict(self, states):
+        action_probs, values = self.model(states, training=False)
+        return tf.where(action_probs > 0.5, 1, 0), values
+
+    def choose_actions(self, states):
+        """
+        Returns:
+            np.ndarray (rooms, 1) of actions (1 - heating on, 0 - heating off)
+        """
+        actions, _ = self.predict(tf.convert_to_tensor(states, dtype=tf.float32))
+        return actions.numpy()
+
+    def export(self, export_dir: str):
+        """
+        Save the compiled policy as SavedModel (load it with tf.saved_model.load(export_dir).predict).
+        """
+        tf.saved_model.save(self, export_dir, signatures={'serving_default': self.predict.get_concrete_function()})
+
+    def export_tflite(self, file: str):
+        """
+        Convert the compiled policy to TFLite (GRU layers may need TF select ops).
+        """
+        converter = tf.lite.TFLiteConverter.from_concrete_functions([self.predict.get_concrete_function()], self)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS, tf.lite.OpsSet.SELECT_TF_OPS]
+        with open(file, 'wb') as f:
+            f.write(converter.convert())
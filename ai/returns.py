@@ -0,0 +1,55 @@
+import numpy as np
+
+
+class Returns:
+    """
+    Return and advantage estimation over whole rollout segments - arrays (time, rooms) computed at once,
+    the reverse scans run over the time axis and are vectorized over rooms.
+    The segment is bootstrapped with the value of the observation after its last step (next_values[-1]).
+    """
+
+    @staticmethod
+    def td(rewards, values, next_values, gamma=0.98):
+        """
+        One-step TD errors: rewards + gamma * next_values - values.
+        """
+        return rewards + gamma * next_values - values
+
+    @staticmethod
+    def n_step(rewards, values, next_values, gamma=0.98, n=5):
+        """
+        n-step returns G_t = sum_{k<m} gamma^k * r_{t+k} + gamma^m * V(s_{t+m}), m = min(n, steps to the segment end).
+
+        Args:
+            rewards, values, next_values (np.ndarray): (time, rooms) arrays, next_values[t] = V(s_{t+1}).
+        Returns:
+            (advantages, returns) - (time, rooms) arrays
+        """
+        length = len(rewards)
+        returns = np.zeros_like(rewards)
+        for k in range(min(n, length)):
+            returns[:length - k] += gamma ** k * rewards[k:]
+
+        horizons = np.minimum(n, length - np.arange(length))
+        bootstrap = next_values[np.arange(length) + horizons - 1]
+        returns += (gamma ** horizons).reshape((-1,) + (1,) * (rewards.ndim - 1)).astype(rewards.dtype) * bootstrap
+        return returns - values, returns
+
+    @staticmethod
+    def gae(rewards, values, next_values, gamma=0.98, lam=0.95):
+        """
+        Generalized Advantage Estimation: A_t = delta_t + gamma * lam * A_{t+1} (reverse scan over time),
+        returns (critic targets) are A_t + V(s_t). lam=0 gives one-step TD, lam=1 Monte Carlo returns.
+
+        Args:
+            rewards, values, next_values (np.ndarray): (time, rooms) arrays, next_values[t] = V(s_{t+1}).
+        Returns:
+            (advantages, returns) - (time, rooms) arrays
+        """
+        deltas = Returns.td(rewards, values, next_values, gamma)
+        advantages = np.empty_like(deltas)
+        running = np.zeros_like(deltas[0])
+        for t in range(len(deltas) - 1, -1, -1):
+            running = deltas[t] + gamma * lam * running
+            advantages[t] = running
+        return advantages, advantages + values
@@ -0,0 +1,140 @@
+import multiprocessing as mp
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class RolloutBuffer:
+    """
+    Preallocated experience buffer in shared memory. Agents (processes) write their experiences directly into
+    their own part of the buffer (no pickling, no manager process) and the learner reads all of them as arrays.
+
+    Attributes:
+        num_agents (int): the number of agents writing to the buffer.
+        steps (int): the number of steps (experiences) per agent.
+        rooms (int): the number of rooms (batch of one environment step).
+        states (np.ndarray): (num_agents, steps, rooms, window, features) float32.
+        actions, advantages, rewards, returns (np.ndarray): (num_agents, steps, rooms) float32.
+        cursors (np.ndarray): (num_agents,) the number of steps written by every agent.
+    """
+    DTYPE = np.float32
+    FIELDS = ('actions', 'advantages', 'rewards', 'returns')
+
+    def __init__(self, num_agents: int, steps: int, rooms: int, window: int, features: int):
+        """
+        Constructor (creates the shared memory block - call close() and unlink() at the end).
+        """
+        self.num_agents = num_agents
+        self.steps = steps
+        self.rooms = rooms
+        self.window = window
+        self.features = features
+        self.done_events = [mp.Event() for _ in range(num_agents)]
+        self.shm = shared_memory.SharedMemory(create=True, size=self._size())
+        self._attach_arrays()
+        self.clear()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['shm'] = self.shm.name
+        for name, _, _ in self._layout():
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.shm = shared_memory.SharedMemory(name=state['shm'])
+        self._attach_arrays()
+
+    def _layout(self):
+        step_shape = (self.num_agents, self.steps, self.rooms)
+        layout = [('cursors', (self.num_agents,), np.int64),
+                  ('states', (*step_shape, self.window, self.features), self.DTYPE)]
+        layout += [(name, step_shape, self.DTYPE) for name in self.FIELDS]
+        return layout
+
+    def _size(self):
+        return sum(int(np.prod(shape)) * np.dtype(dtype).itemsize for _, shape, dtype in self._layout())
+
+    def _attach_arrays(self):
+        offset = 0
+        for name, shape, dtype in self._layout():
+            array = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=offset)
+            setattr(self, name, array)
+            offset += array.nbytes
+
+    def clear(self):
+        """
+        Prepare the buffer for the next epoch (only cursors and signals are reset, data are overwritten).
+        """
+        self.cursors[:] = 0
+        for event in self.done_events:
+            event.clear()
+
+    def write(self, agent_id: int, states, actions, advantages, rewards, returns):
+        """
+        Write one experience (one environment step of all rooms) at the agent's cursor.
+        """
+        cursor = self.cursors[agent_id]
+        step = cursor % self.steps
+        self.states[agent_id, step] = states
+        for name, values in zip(self.FIELDS, (actions, advantages, rewards, returns)):
+            getattr(self, name)[agent_id, step] = np.reshape(values, -1)
+        self.cursors[agent_id] = cursor + 1
+
+    def write_segment(self, agent_id: int, states, actions, advantages, rewards, returns):
+        """
+        Write several experiences at once (arrays with the steps as the first dimension) at the agent's cursor.
+        The segment must not cross the end of the agent's part of the buffer.
+        """
+        cursor = self.cursors[agent_id]
+        step = cursor % self.steps
+        steps = slice(step, step + len(states))
+        self.states[agent_id, steps] = states
+        for name, values in zip(self.FIELDS, (actions, advantages, rewards, returns)):
+            getattr(self, name)[agent_id, steps] = np.reshape(values, (len(states), -1))
+        self.cursors[agent_id] = cursor + len(states)
+
+    def set_done(self, agent_id: int):
+        self.done_events[agent_id].set()
+
+    def is_done(self):
+        return all(event.is_set() for event in self.done_events)
+
+    def wait(self, timeout=None):
+        """
+        Wait until all agents finished (or timeout).
+
+        Returns:
+            bool: True when all agents finished.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for event in self.done_events:
+            remaining = None if deadline is None else max(0., deadline - time.monotonic())
+            if not event.wait(remaining):
+                return False
+        return True
+
+    def get_progress(self):
+        return int(self.cursors.sum()), self.num_agents * self.steps
+
+    def get_experiences(self):
+        """
+        Views of all written experiences (flattened to one batch dimension).
+
+        Returns:
+            tuple of (states, actions, advantages, rewards, returns)
+        """
+        written = int(self.cursors.min())
+        states = self.states[:, :written].reshape(-1, self.window, self.features)
+        return (states, *(getattr(self, name)[:, :written].reshape(-1) for name in self.FIELDS))
+
+    def close(self):
+        # arrays have to be released before the shared memory block is closed
+        for name, _, _ in self._layout():
+            setattr(self, name, None)
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
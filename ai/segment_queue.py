@@ -0,0 +1,83 @@
+import time
+
+import numpy as np
+
+from .rollout_buffer import RolloutBuffer
+
+
+class SegmentQueue(RolloutBuffer):
+    """
+    RolloutBuffer used as a queue of rollout segments (asynchronous training).
+    The steps of every agent are divided into `segments` slots of `segment_len` steps written in a circle.
+    An agent publishes a full slot together with the weights version used to collect it,
+    the learner trains on ready slots and releases them for the agent.
+
+    Attributes:
+        segments (int): the number of slots per agent.
+        segment_len (int): the number of steps in one slot.
+        versions (np.ndarray): (num_agents, segments) weights version of ready slots (FREE - slot can be written).
+    """
+    FREE = -1
+    POLL_INTERVAL = 0.001  # in seconds
+
+    def __init__(self, num_agents: int, segments: int, segment_len: int, rooms: int, window: int, features: int):
+        self.segments = segments
+        self.segment_len = segment_len
+        super(SegmentQueue, self).__init__(num_agents, segments * segment_len, rooms, window, features)
+
+    def _layout(self):
+        return super(SegmentQueue, self)._layout() + [('versions', (self.num_agents, self.segments), np.int64)]
+
+    def clear(self):
+        super(SegmentQueue, self).clear()
+        self.versions[:] = self.FREE
+
+    def get_slot(self, agent_id: int):
+        return int(self.cursors[agent_id] % self.steps) // self.segment_len
+
+    def is_segment_start(self, agent_id: int):
+        return self.cursors[agent_id] % self.segment_len == 0
+
+    def wait_for_free_slot(self, agent_id: int, stop_event=None):
+        """
+        Block the agent until its next slot was released by the learner.
+
+        Returns:
+            bool: False if stop_event was set while waiting.
+        """
+        slot = self.get_slot(agent_id)
+        while self.versions[agent_id, slot] != self.FREE:
+            if stop_event is not None and stop_event.is_set():
+                return False
+            time.sleep(self.POLL_INTERVAL)
+        return True
+
+    def publish_segment(self, agent_id: int, version: int):
+        """
+        Mark the slot just filled by the agent as ready (called after the last step of the segment).
+        """
+        slot = (self.get_slot(agent_id) - 1) % self.segments
+        self.versions[agent_id, slot] = version
+
+    def get_ready_segments(self):
+        """
+        Returns:
+            list of (agent_id, slot, version) of ready slots (the oldest versions first).
+        """
+        agents, slots = np.nonzero(self.versions != self.FREE)
+        ready = [(int(a), int(s), int(self.versions[a, s])) for a, s in zip(agents, slots)]
+        return sorted(ready, key=lambda segment: segment[2])
+
+    def get_segment(self, agent_id: int, slot: int):
+        """
+        Views of one slot (flattened to one batch dimension).
+
+        Returns:
+            tuple of (states, actions, advantages, rewards, returns)
+        """
+        steps = slice(slot * self.segment_len, (slot + 1) * self.segment_len)
+        states = self.states[agent_id, steps].reshape(-1, self.window, self.features)
+        return (states, *(getattr(self, name)[agent_id, steps].reshape(-1) for name in self.FIELDS))
+
+    def release(self, agent_id: int, slot: int):
+        self.versions[agent_id, slot] = self.FREE
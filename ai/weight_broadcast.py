@@ -0,0 +1,99 @@
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class WeightBroadcast:
+    """
+    Model weights published by the learner to all agents (processes) through one flat float32 buffer
+    in shared memory and a version counter. Agents wait for a new version and copy the weights out.
+
+    Attributes:
+        shapes (list): shapes of all weights arrays (as returned by model.get_weights()).
+        version (mp.Value): the number of published weights (0 - nothing published yet).
+    """
+    DTYPE = np.float32
+
+    def __init__(self, weights: list):
+        """
+        Constructor (creates the shared memory block - call close() and unlink() at the end).
+
+        Args:
+            weights (list): model weights (only shapes are used).
+        """
+        self.shapes = [np.shape(w) for w in weights]
+        self.sizes = [int(np.prod(shape)) for shape in self.shapes]
+        self.version = mp.Value('q', 0)
+        self.condition = mp.Condition(self.version.get_lock())
+        size = max(1, sum(self.sizes)) * np.dtype(self.DTYPE).itemsize
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.flat = np.ndarray((sum(self.sizes),), dtype=self.DTYPE, buffer=self.shm.buf)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['shm'] = self.shm.name
+        del state['flat']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.shm = shared_memory.SharedMemory(name=state['shm'])
+        self.flat = np.ndarray((sum(self.sizes),), dtype=self.DTYPE, buffer=self.shm.buf)
+
+    def publish(self, weights: list):
+        """
+        Write new weights and wake up all waiting agents.
+
+        Returns:
+            int: the new version.
+        """
+        with self.condition:
+            offset = 0
+            for w, size in zip(weights, self.sizes):
+                self.flat[offset:offset + size] = np.reshape(w, -1)
+                offset += size
+            self.version.value += 1
+            self.condition.notify_all()
+            return self.version.value
+
+    def notify(self):
+        """
+        Wake up all waiting agents without changing weights (e.g. to stop them).
+        """
+        with self.condition:
+            self.version.value += 1
+            self.condition.notify_all()
+
+    def wait_for_version(self, seen_version: int, timeout=None):
+        """
+        Wait until the version is newer than seen_version (or timeout).
+
+        Returns:
+            int: actual version (equal to seen_version after timeout).
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.version.value > seen_version, timeout)
+            return self.version.value
+
+    def get_version(self):
+        return self.version.value
+
+    def read(self):
+        """
+        Copy of the actual weights.
+
+        Returns:
+            (list, int): weights (reshaped) and their version.
+        """
+        with self.condition:
+            weights = [part.reshape(shape).copy()
+                       for part, shape in zip(np.split(self.flat, np.cumsum(self.sizes)[:-1]), self.shapes)]
+            return weights, self.version.value
+
+    def close(self):
+        self.flat = None
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
@@ -1,45 +1,215 @@
-import pandas as pd
-import numpy as np
+import argparse
 import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # optional - only for Parquet files
+    pq = None
 
 directory_path = 'data'
 
 MIN_VALUE = -120
 MAX_VALUE = 120
+CHUNK_ROWS = 100_000  # rows read at once
+FIRST_ROWS = 5  # offending rows reported per column
+EXTENSIONS = ('.csv', '.npy', '.npz', '.parquet')
+# indices, flags and experience fields (not temperatures) - only checked for NaN / inf
+UNRANGED_COLUMNS = ('time', 'room', 'heating_on', 'actions', 'advantages', 'rewards', 'returns')
 
-# find and check all csv files
-for filename in os.listdir(directory_path):
-    if filename.endswith('.csv'):
-        file_path = os.path.join(directory_path, filename)
-        print(f"File processing: {filename}")
 
-        data = pd.read_csv(file_path)
+class Summary:
+    """
+    Statistics of one file collected chunk by chunk (memory is independent of the file size).
 
-        # check for NaN, inf, -inf
-        problematic_values = data.isin([np.nan, np.inf, -np.inf])
+    Attributes:
+        columns (list): column names.
+        rows (int): the number of checked rows.
+        non_finite, out_of_range (np.ndarray): counts of NaN / inf values and finite values out of the range
+            (columns in UNRANGED_COLUMNS are not range checked).
+        minimum, maximum (np.ndarray): min / max of finite values.
+        first_rows (list): per column sorted list of the first offending rows (at most first_n).
+    """
+    def __init__(self, columns, first_n=FIRST_ROWS, min_value=MIN_VALUE, max_value=MAX_VALUE):
+        self.columns = list(columns)
+        self.first_n = first_n
+        self.min_value = min_value
+        self.max_value = max_value
+        self.rows = 0
+        self.non_finite = np.zeros(len(self.columns), dtype=np.int64)
+        self.out_of_range = np.zeros(len(self.columns), dtype=np.int64)
+        self.minimum = np.full(len(self.columns), np.inf)
+        self.maximum = np.full(len(self.columns), -np.inf)
+        self.first_rows = [[] for _ in self.columns]
+        self.ranged = np.array([column not in UNRANGED_COLUMNS for column in self.columns], dtype=bool)
 
-        # check range
-        out_of_range = (data < MIN_VALUE) | (data > MAX_VALUE)
+    def update(self, block, columns=None, row_offset=None):
+        """
+        Args:
+            block (np.ndarray): (rows, ..., columns) values - the middle axes (e.g. window of states) are reduced.
+            columns (list): indices of the block columns in the summary (all by default).
+            row_offset (int): row number of the first block row (by default the number of rows checked so far).
+        """
+        row_offset = self.rows if row_offset is None else row_offset
+        block = np.asarray(block, dtype=np.float64)
+        if block.size == 0:
+            return
+        block = block.reshape(len(block), -1, block.shape[-1])
+        columns = np.arange(len(self.columns)) if columns is None else np.asarray(columns)
 
-        if problematic_values.any().any():
-            print("Find problematic values:")
-            # print problematic columns and rows
-            for col in data.columns:
-                if problematic_values[col].any():
-                    print(f"  Column: {col}")
-                    rows = problematic_values[col][problematic_values[col] == True].index.tolist()
-                    print(f"    Rows: {rows}")
-        else:
-            print("There are no problematic values.")
-
-        if out_of_range.any().any():
-            print("Find out-of-range values:")
-            for col in data.columns:
-                if out_of_range[col].any():
-                    print(f"  Column: {col}")
-                    rows = out_of_range[col][out_of_range[col] == True].index.tolist()
-                    print(f"    Row: {rows}")
+        finite = np.isfinite(block)
+        out_of_range = finite & ((block < self.min_value) | (block > self.max_value)) & self.ranged[columns]
+        self.non_finite[columns] += (~finite).sum(axis=(0, 1))
+        self.out_of_range[columns] += out_of_range.sum(axis=(0, 1))
+        masked = np.where(finite, block, np.nan)
+        if finite.any():
+            with np.errstate(all='ignore'):
+                self.minimum[columns] = np.fmin(self.minimum[columns], np.nanmin(masked, axis=(0, 1)))
+                self.maximum[columns] = np.fmax(self.maximum[columns], np.nanmax(masked, axis=(0, 1)))
+
+        bad_rows = (~finite | out_of_range).any(axis=1)  # (rows, columns)
+        for column, bad in zip(columns, bad_rows.T):
+            missing = self.first_n - len(self.first_rows[column])
+            if missing > 0 and bad.any():
+                self.first_rows[column].extend((np.flatnonzero(bad)[:missing] + row_offset).tolist())
+
+    def advance(self, rows):
+        self.rows += rows
+
+    def is_ok(self):
+        return not (self.non_finite.any() or self.out_of_range.any())
+
+
+def check_csv(file_path, summary_options):
+    summary = None
+    for chunk in pd.read_csv(file_path, chunksize=CHUNK_ROWS):
+        if summary is None:
+            summary = Summary(chunk.columns, **summary_options)
+        summary.update(chunk.apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64))
+        summary.advance(len(chunk))
+    return summary or Summary([], **summary_options)
+
+
+def check_array(array, summary_options, name='value'):
+    """
+    Memory-mapped .npy (or other array) - (rows,) one column, (rows, ..., features) one column per feature.
+    """
+    columns = [name] if array.ndim == 1 else [f'{name}[{i}]' for i in range(array.shape[-1])]
+    summary = Summary(columns, **summary_options)
+    for start in range(0, len(array), CHUNK_ROWS):
+        block = np.asarray(array[start:start + CHUNK_ROWS])
+        summary.update(block[:, np.newaxis] if array.ndim == 1 else block)
+        summary.advance(len(block))
+    return summary
+
+
+def check_npz(file_path, summary_options):
+    """
+    Compressed npz (e.g. DataDict stream) - members '<column>_<chunk>' are parts of one column.
+    """
+    with np.load(file_path) as npz:
+        members = {}
+        for name in sorted(npz.files):
+            prefix, _, suffix = name.rpartition('_')
+            members.setdefault(prefix if suffix.isdigit() else name, []).append(name)
+        summary = Summary(members, **summary_options)
+        for index, names in enumerate(members.values()):
+            row = 0
+            for name in names:  # one member in memory at a time
+                values = np.atleast_1d(npz[name])
+                if values.size == 0:
+                    continue
+                values = values.reshape(len(values), -1, 1)
+                for start in range(0, len(values), CHUNK_ROWS):
+                    summary.update(values[start:start + CHUNK_ROWS], [index], row + start)
+                row += len(values)
+            summary.rows = max(summary.rows, row)
+    return summary
+
+
+def check_parquet(file_path, summary_options):
+    if pq is None:
+        raise ImportError("pyarrow is required to check parquet files")
+    parquet = pq.ParquetFile(file_path)
+    summary = Summary(parquet.schema_arrow.names, **summary_options)
+    for batch in parquet.iter_batches(batch_size=CHUNK_ROWS):
+        summary.update(np.column_stack([column.to_numpy(zero_copy_only=False) for column in batch.columns]))
+        summary.advance(batch.num_rows)
+    return summary
+
+
+def check_file(file_path, summary_options):
+    """
+    Returns:
+        (file_path, Summary | None, error message | None)
+    """
+    try:
+        if file_path.endswith('.csv'):
+            summary = check_csv(file_path, summary_options)
+        elif file_path.endswith('.npy'):
+            summary = check_array(np.load(file_path, mmap_mode='r'), summary_options,
+                                  os.path.splitext(os.path.basename(file_path))[0])
+        elif file_path.endswith('.npz'):
+            summary = check_npz(file_path, summary_options)
         else:
-            print("All values are in range [-120,120].")
+            summary = check_parquet(file_path, summary_options)
+        return file_path, summary, None
+    except Exception as e:  # one broken file should not stop checking of the others
+        return file_path, None, f'{type(e).__name__}: {e}'
+
+
+def find_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isfile(path):
+            files.append(path)
+            continue
+        files += [os.path.join(path, name) for name in os.listdir(path)
+                  if name.endswith(EXTENSIONS) and os.path.isfile(os.path.join(path, name))]
+    return sorted(files)
+
+
+def print_summary(file_path, summary, error):
+    if error is not None:
+        print(f"{file_path}: ERROR {error}")
+        return
+    status = "OK" if summary.is_ok() else "PROBLEMS"
+    print(f"{file_path}: {summary.rows} rows, {len(summary.columns)} columns - {status}")
+    width = max([len(column) for column in summary.columns] + [6])
+    print(f"  {'column':<{width}} {'min':>12} {'max':>12} {'non-finite':>10} {'range':>8}  first rows")
+    for i, column in enumerate(summary.columns):
+        first_rows = ', '.join(str(row) for row in summary.first_rows[i])
+        print(f"  {column:<{width}} {summary.minimum[i]:12.4g} {summary.maximum[i]:12.4g} "
+              f"{summary.non_finite[i]:10d} {summary.out_of_range[i]:8d}  {first_rows}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check data files (csv, npy, npz, parquet and experience shards) "
+                                                 "for NaN / inf and values out of the range.")
+    parser.add_argument('paths', nargs='*', default=[directory_path], help="files or directories (not recursive)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="parallel processes")
+    parser.add_argument('--first', type=int, default=FIRST_ROWS, help="offending rows reported per column")
+    parser.add_argument('--min', type=float, default=MIN_VALUE)
+    parser.add_argument('--max', type=float, default=MAX_VALUE)
+    args = parser.parse_args()
+
+    files = find_files(args.paths)
+    summary_options = {'first_n': args.first, 'min_value': args.min, 'max_value': args.max}
+    print(f"Checking {len(files)} files, range [{args.min:g}, {args.max:g}]\n")
+
+    failed = 0
+    with ProcessPoolExecutor(max_workers=max(1, min(args.workers, len(files) or 1))) as executor:
+        for file_path, summary, error in executor.map(check_file, files, [summary_options] * len(files)):
+            print_summary(file_path, summary, error)
+            failed += error is not None or not summary.is_ok()
+
+    print(f"\n{len(files) - failed} of {len(files)} files without problems")
+    return 1 if failed else 0
+
 
-        print("\n")
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,4 +1,12 @@
 from .numerical import TemperatureModel
+from .observation import Observation
+from .building import Building
+from .weather import Weather
+from .thermal_engine import ThermalEngine
+from .state_history import StateHistory
 from .data_dict import DataDict
 from .environment import Environment
 from .two_state_switch import TwoStateSwitch
+from .vector_environment import VectorEnvironment
+from .event_simulation import EventDrivenSimulation
+from .evaluation import Evaluation
@@ -0,0 +1,106 @@
+import numpy as np
+
+
+class Building:
+    """
+    Topology of a building - rooms (geometry) and walls shared by neighbouring rooms.
+
+    Thermal coefficients of ThermalEngine are derived from the geometry: the heat capacity of a room scales
+    with its volume, k_coef with the area of its outside walls and mu_coef with its floor area (the reference
+    room 4 x 4 x 2.6 m with two outside walls has exactly the TemperatureModel coefficients). Heat flows through
+    shared walls between neighbouring rooms - the coupling is sparse (one entry per wall), so one step costs
+    O(rooms + walls) also for thousands of rooms.
+
+    Attributes:
+        rooms_num (int): the number of rooms.
+        floor_area (np.ndarray): floor area of every room [m2].
+        height (np.ndarray): height of every room [m].
+        outside_wall_area (np.ndarray): area of outside walls of every room [m2].
+        walls (np.ndarray): (walls_num, 2) indices of rooms sharing a wall.
+        wall_area (np.ndarray): area of every shared wall [m2].
+        capacity (np.ndarray): heat capacity of every room [J/K].
+        k_coef (np.ndarray): coefficient of thermal transmittance from room to outdoor (per room).
+        mu_coef (np.ndarray): coefficient of thermal transmittance from floor to room (per room).
+        wall_coef (np.ndarray): thermal conductance of every shared wall [J/(min K)].
+    """
+    OUTSIDE_U = 0.8  # W/(m2 K) outside wall
+    FLOOR_U = 8.45  # W/(m2 K) floor to room
+    WALL_U = 1.8  # W/(m2 K) wall between rooms
+    REFERENCE_CAPACITY = 651000.  # J/K of the reference room (air, walls, furniture)
+    REFERENCE_VOLUME = 4 * 4 * 2.6  # m3
+
+    def __init__(self, floor_area, height=2.6, outside_wall_area=20.8, walls=(), wall_area=()):
+        """
+        Constructor.
+
+        Args:
+            floor_area (array_like): one floor area per room [m2].
+            height (float | array_like): shared or one per room [m].
+            outside_wall_area (float | array_like): shared or one per room [m2].
+            walls (array_like): pairs of rooms sharing a wall (e.g. [(0, 1), (1, 2)]).
+            wall_area (float | array_like): shared or one per wall [m2].
+        """
+        self.floor_area = np.asarray(floor_area, dtype=np.float64).reshape(-1)
+        self.rooms_num = len(self.floor_area)
+        self.height = np.broadcast_to(np.asarray(height, dtype=np.float64), (self.rooms_num,)).copy()
+        self.outside_wall_area = np.broadcast_to(np.asarray(outside_wall_area, dtype=np.float64),
+                                                 (self.rooms_num,)).copy()
+        self.walls = np.asarray(walls, dtype=np.int64).reshape(-1, 2)
+        self.wall_area = np.broadcast_to(np.asarray(wall_area, dtype=np.float64), (len(self.walls),)).copy()
+        if len(self.walls) and (self.walls.min() < 0 or self.walls.max() >= self.rooms_num):
+            raise ValueError("Wall between unknown rooms")
+        if np.any(self.walls[:, 0] == self.walls[:, 1]):
+            raise ValueError("Wall of a room with itself")
+
+        self.capacity = self.REFERENCE_CAPACITY * (self.floor_area * self.height / self.REFERENCE_VOLUME)
+        self.k_coef = self.outside_wall_area * self.OUTSIDE_U * 60 / self.capacity
+        self.mu_coef = self.floor_area * self.FLOOR_U * 60 / self.capacity
+        self.wall_coef = self.wall_area * self.WALL_U * 60
+
+    @staticmethod
+    def independent(rooms_num: int):
+        """
+        Reference rooms without shared walls (the same model as TemperatureModel for every room).
+        """
+        return Building(np.full(rooms_num, 16.))
+
+    @staticmethod
+    def grid(rows: int, columns: int, room_width=4., room_length=4., height=2.6):
+        """
+        Floor of rows x columns equal rooms (row by row, as drawn by Simulator). Rooms on the perimeter
+        have outside walls, neighbouring rooms share walls.
+        """
+        index = np.arange(rows * columns).reshape(rows, columns)
+        horizontal = np.stack([index[:, :-1].ravel(), index[:, 1:].ravel()], axis=1)  # left - right neighbours
+        vertical = np.stack([index[:-1, :].ravel(), index[1:, :].ravel()], axis=1)  # upper - lower neighbours
+        row, column = np.divmod(np.arange(rows * columns), columns)
+        outside_sides_x = (row == 0).astype(np.int64) + (row == rows - 1)  # walls along the room width
+        outside_sides_y = (column == 0).astype(np.int64) + (column == columns - 1)  # walls along the room length
+        return Building(np.full(rows * columns, room_width * room_length), height,
+                        outside_sides_x * room_width * height + outside_sides_y * room_length * height,
+                        np.concatenate([horizontal, vertical]),
+                        np.concatenate([np.full(len(horizontal), room_length * height),
+                                        np.full(len(vertical), room_width * height)]))
+
+    @staticmethod
+    def concatenate(buildings: list):
+        """
+        Many buildings as one topology (rooms stacked in order, no walls between buildings).
+        """
+        offsets = np.cumsum([0] + [building.rooms_num for building in buildings])
+        return Building(np.concatenate([building.floor_area for building in buildings]),
+                        np.concatenate([building.height for building in buildings]),
+                        np.concatenate([building.outside_wall_area for building in buildings]),
+                        np.concatenate([building.walls + offset for building, offset in zip(buildings, offsets)]),
+                        np.concatenate([building.wall_area for building in buildings]))
+
+    def exchange(self, indoor_temperature):
+        """
+        Indoor temperature change of every room in one minute caused by heat flow through shared walls.
+
+        Args:
+            indoor_temperature (np.ndarray): one temperature per room.
+        """
+        first, second = self.walls[:, 0], self.walls[:, 1]
+        flow = self.wall_coef * (indoor_temperature[second] - indoor_temperature[first])  # into the first room
+        return (np.bincount(first, flow, self.rooms_num) - np.bincount(second, flow, self.rooms_num)) / self.capacity
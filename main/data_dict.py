@@ -1,40 +1,241 @@
 import os
+import zipfile
 
+import numpy as np
 import pandas as pd
 from matplotlib import pyplot as plt
 
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional - only for Parquet / Arrow IPC files
+    pa = pq = None
+
 
 class DataDict:
     """
-    This is helper class to save all data about environment
+    This is helper class to save all data about environment.
+
+    Values are recorded into preallocated typed NumPy columns (chunks of chunk_size rows), one row per room
+    and minute. Full chunks can be streamed to a file (Parquet, Arrow IPC or compressed npz - see open_stream())
+    and released from memory. CSV export is kept for compatibility (save_data()).
+
+    Attributes:
+        data (dict): {column: np.ndarray} of all rows kept in memory (not streamed yet).
+        rooms_num (int): the number of recorded rooms (column 'room' is exported only for more than one room).
+        rows (int): the number of all recorded rows (also streamed ones).
     """
-    def __init__(self):
-        self.data = {
-            'time': [],
-            'outdoor_temp': [],
-            'indoor_temp': [],
-            'heating_temp': [],
-            'heating_on': []
-        }
-
-    def add_data(self, time: int, outdoor_temp: float, indoor_temp: float, heating_temp: float, heating_on: bool):
-        self.data['time'].append(time)
-        self.data['outdoor_temp'].append(outdoor_temp)
-        self.data['indoor_temp'].append(indoor_temp)
-        self.data['heating_temp'].append(heating_temp)
-        self.data['heating_on'].append(int(heating_on))
-
-    def save_data(self, name: str = 'temp', path: str = 'data/table'):
-        df = pd.DataFrame(self.data)
+    COLUMNS = {
+        'time': np.int64,
+        'outdoor_temp': np.float64,
+        'indoor_temp': np.float64,
+        'heating_temp': np.float64,
+        'heating_on': np.int8,
+        'room': np.int32,
+    }
+    CHUNK_SIZE = 1 << 16
+    FORMATS = ('parquet', 'arrow', 'npz')
+
+    def __init__(self, chunk_size: int = CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.chunks = []  # full chunks kept in memory
+        self.chunk = self._new_chunk()
+        self.filled = 0  # rows in the actual chunk
+        self.rows = 0
+        self.rooms_num = 1
+        self.stream = None
+        self.stream_format = None
+        self.streamed_chunks = 0
+
+    def _new_chunk(self):
+        return {column: np.empty(self.chunk_size, dtype=dtype) for column, dtype in self.COLUMNS.items()}
+
+    def _columns(self):
+        return [column for column in self.COLUMNS if column != 'room' or self.rooms_num > 1]
+
+    @property
+    def data(self):
+        return {column: np.concatenate([chunk[column] for chunk in self.chunks] +
+                                       [self.chunk[column][:self.filled]])
+                for column in self._columns()}
+
+    def __len__(self):
+        return self.rows
+
+    def add_data(self, time: int, outdoor_temp: float, indoor_temp: float, heating_temp: float, heating_on: bool,
+                 room: int = 0):
+        if self.filled == self.chunk_size:
+            self._finish_chunk()
+        row = self.filled
+        self.chunk['time'][row] = time
+        self.chunk['outdoor_temp'][row] = outdoor_temp
+        self.chunk['indoor_temp'][row] = indoor_temp
+        self.chunk['heating_temp'][row] = heating_temp
+        self.chunk['heating_on'][row] = heating_on
+        self.chunk['room'][row] = room
+        self.rooms_num = max(self.rooms_num, room + 1)
+        self.filled += 1
+        self.rows += 1
+
+    def add_many(self, time, outdoor_temp, indoor_temp, heating_temp, heating_on, room=0):
+        """
+        Same as add_data() but for arrays of values (e.g. one value per minute or one value per room).
+        """
+        values = np.broadcast_arrays(time, outdoor_temp, indoor_temp, heating_temp, heating_on, room)
+        values = [np.ravel(v) for v in values]
+        self.rooms_num = max(self.rooms_num, int(values[-1].max(initial=0)) + 1)
+        start = 0
+        while start < len(values[0]):
+            if self.filled == self.chunk_size:
+                self._finish_chunk()
+            count = min(self.chunk_size - self.filled, len(values[0]) - start)
+            for column, v in zip(self.COLUMNS, values):
+                self.chunk[column][self.filled:self.filled + count] = v[start:start + count]
+            self.filled += count
+            self.rows += count
+            start += count
+
+    def add_rooms(self, time, outdoor_temp, indoor_temp, heating_temp, heating_on):
+        """
+        One row per room (arrays of room values, time and outdoor temperature may be shared).
+        """
+        rooms_num = len(np.atleast_1d(indoor_temp))
+        self.add_many(time, outdoor_temp, indoor_temp, heating_temp, heating_on, np.arange(rooms_num))
+
+    def record(self, env):
+        """
+        Record all rooms of the environment (Environment or VectorEnvironment) at its actual time.
+        """
+        engine = env.engine
+        time = env.get_room_time() if hasattr(env, 'get_room_time') else env.get_time()
+        self.add_rooms(time, engine.outdoor_temperature, engine.indoor_temperature, engine.heating_temperature,
+                       engine.heating_source_on)
+
+    def _finish_chunk(self):
+        chunk = self.chunk
+        if self.stream is not None:
+            self._write_chunk({column: chunk[column] for column in self.COLUMNS})
+        else:
+            self.chunks.append(chunk)
+        self.chunk = self._new_chunk()
+        self.filled = 0
 
+    @staticmethod
+    def _format(file, file_format=None):
+        file_format = file_format or os.path.splitext(file)[1].lstrip('.')
+        file_format = {'pq': 'parquet', 'feather': 'arrow', 'ipc': 'arrow'}.get(file_format, file_format)
+        if file_format not in DataDict.FORMATS:
+            raise ValueError(f"Unknown file format: {file_format}")
+        if file_format in ('parquet', 'arrow') and pa is None:
+            raise ImportError(f"pyarrow is required to write {file_format} files")
+        return file_format
+
+    def open_stream(self, file: str, file_format: str = None):
+        """
+        Stream all (already recorded and future) full chunks to the file and release them from memory.
+        Call close() at the end to write the rest of rows.
+
+        Args:
+            file (str): path of the file.
+            file_format (str): 'parquet', 'arrow' (IPC file) or 'npz' (by default from the file extension).
+        """
+        self.stream_format = self._format(file, file_format)
+        directory = os.path.dirname(file)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        if self.stream_format == 'parquet':
+            self.stream = pq.ParquetWriter(file, self._schema())
+        elif self.stream_format == 'arrow':
+            self.stream = pa.ipc.new_file(file, self._schema())
+        else:
+            self.stream = zipfile.ZipFile(file, 'w', compression=zipfile.ZIP_DEFLATED)
+        self.streamed_chunks = 0
+
+        for chunk in self.chunks:
+            self._write_chunk(chunk)
+        self.chunks = []
+
+    def _schema(self):
+        return pa.schema([(column, pa.from_numpy_dtype(np.dtype(dtype))) for column, dtype in self.COLUMNS.items()])
+
+    def _write_chunk(self, chunk):
+        if self.stream_format == 'npz':
+            for column, values in chunk.items():
+                with self.stream.open(f'{column}_{self.streamed_chunks:06d}.npy', 'w', force_zip64=True) as f:
+                    np.lib.format.write_array(f, np.ascontiguousarray(values))
+        else:
+            self.stream.write_table(pa.table(chunk, schema=self._schema()))
+        self.streamed_chunks += 1
+
+    def close(self):
+        """
+        Write the rest of rows to the stream and close it (no-op without stream).
+        """
+        if self.stream is None:
+            return
+        self._write_chunk({column: self.chunk[column][:self.filled] for column in self.COLUMNS})
+        self.stream.close()
+        self.stream = None
+        self.chunk = self._new_chunk()
+        self.filled = 0
+
+    @staticmethod
+    def load(file: str, file_format: str = None):
+        """
+        Read the file written by open_stream() / save_data() (binary formats or CSV).
+
+        Returns:
+            DataDict
+        """
+        file_format = 'csv' if file.endswith('.csv') and file_format is None else file_format
+        if file_format == 'csv':
+            columns = {column: values.to_numpy() for column, values in pd.read_csv(file).items()}
+        elif DataDict._format(file, file_format) == 'npz':
+            with np.load(file) as npz:
+                names = sorted(npz.files)
+                columns = {column: np.concatenate([npz[name] for name in names if name.rsplit('_', 1)[0] == column])
+                           for column in DataDict.COLUMNS}
+        elif DataDict._format(file, file_format) == 'parquet':
+            columns = {column: values.to_numpy() for column, values in zip(*DataDict._table_columns(pq.read_table(file)))}
+        else:
+            with pa.memory_map(file) as source:
+                columns = {column: values.to_numpy()
+                           for column, values in zip(*DataDict._table_columns(pa.ipc.open_file(source).read_all()))}
+
+        data = DataDict(chunk_size=max(1, len(columns['time'])))
+        data.add_many(*(columns.get(column, 0) for column in DataDict.COLUMNS))
+        return data
+
+    @staticmethod
+    def _table_columns(table):
+        return table.column_names, [column.combine_chunks() for column in table.columns]
+
+    def save_data(self, name: str = 'temp', path: str = 'data/table', file_format: str = 'csv'):
+        """
+        Save all rows kept in memory.
+
+        Args:
+            file_format (str): 'csv' (compatible with older versions), 'parquet', 'arrow' or 'npz'.
+        """
         if not os.path.exists(path):
             os.makedirs(path)
 
-        file = os.path.join(path, name + '.csv')
-        df.to_csv(file, index=False)
+        if file_format == 'csv':
+            df = pd.DataFrame(self.data)
+            file = os.path.join(path, name + '.csv')
+            df.to_csv(file, index=False)
+            return
+
+        writer = DataDict(self.chunk_size)
+        writer.chunks = self.chunks + [{column: values[:self.filled] for column, values in self.chunk.items()}]
+        writer.open_stream(os.path.join(path, name + '.' + file_format), file_format)
+        writer.close()
 
-    def plot_data(self, name: str = 'temp', path: str = 'data/plots'):
+    def plot_data(self, name: str = 'temp', path: str = 'data/plots', room: int = 0):
         df = pd.DataFrame(self.data)
+        if 'room' in df:
+            df = df[df['room'] == room]
 
         fig, ax1 = plt.subplots()
 
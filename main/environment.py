@@ -1,38 +1,61 @@
-import math
-
 import numpy as np
 
-from main import TemperatureModel
+from main import ThermalEngine, StateHistory, Observation, Building, Weather
 
 
 class Environment:
     """
-    This class is used to create the environment based on the TemperatureModel objects.
+    This class is used to create the environment based on the ThermalEngine (all rooms in one vectorized model).
 
     Attributes:
         rooms_num (int): the number of rooms in the environment
-        rooms_desired_temp (list): one temperature per room (e.g. [21., 20.5, 19.5, 20.5])
-        temp_model (TemperatureModel): the temperature model (numerical approximation of temperatures change per room)
-        state_series (list): list of timeseries of states vectors
+        rooms_desired_temp (np.ndarray): one temperature per room (e.g. [21., 20.5, 19.5, 20.5])
+        engine (ThermalEngine): the temperature model (numerical approximation of temperatures change for all rooms)
+        state_history (StateHistory): preallocated float32 timeseries of states vectors (Observation layout)
+        history_phases (int): the number of interleaved windows per room (one per time % history_phases)
+        history_window (int): the number of state vectors in one window
         time (int): the time of the environment running
+        solver (str): 'euler' (one explicit increment per step) or 'exact' (closed-form solution for any time_step)
+        building (Building | None): topology of rooms (shared walls), None - independent rooms
     """
     T_DAY = 1440
     T_HALF_DAY = T_DAY // 2
+    HISTORY_PHASES = 10  # one window per minute of 10 min. interval
+    HISTORY_WINDOW = 42  # 10min * 42 = 7h
+    SOLVERS = ('euler', 'exact')
 
-    def __init__(self, rooms_desired_temp: list, with_random=True, heating_source_temp=40., sunrise_time=460):
+    def __init__(self, rooms_desired_temp: list, with_random=True, heating_source_temp=40., sunrise_time=460,
+                 solver='euler', history_phases=HISTORY_PHASES, history_window=HISTORY_WINDOW,
+                 building: Building = None, weather: Weather = None):
         """
         Constructor
         Args:
             rooms_desired_temp (list): one temperature per room (e.g. [21., 20.5, 19.5, 20.5])
             heating_source_temp (float): treated as constant
             sunrise_time: (int): in minutes
+            solver: (str): 'euler' or 'exact'
+            history_phases (int): the number of interleaved windows (observation is every history_phases minutes)
+            history_window (int): the number of state vectors in one observation
+            building (Building): optional topology of rooms (e.g. Building.grid(2, 2) for 4 rooms)
+            weather (Weather): outdoor temperature (by default the daily sine, see Weather)
         """
+        if solver not in self.SOLVERS:
+            raise ValueError(f"Unknown solver: {solver}")
+        self.solver = solver
+        self.building = building
         random_val = np.random.uniform(-0.25, 0.25) if with_random else 0
         self.rooms_num = len(rooms_desired_temp)
-        self.rooms_desired_temp = rooms_desired_temp
-        self.temp_model = [TemperatureModel(rooms_desired_temp[i]+random_val, heating_source_temp, sunrise_time, True) for i in range(self.rooms_num)]
-        self.state_series = []
+        self.rooms_desired_temp = np.asarray(rooms_desired_temp, dtype=np.float64)
+        self.engine = ThermalEngine(self.rooms_desired_temp + random_val, heating_source_temp, sunrise_time, building,
+                                    weather)
+        if solver == 'exact':
+            self.engine.check_exact_solver()
         self.time = 0
+        self.history_phases = history_phases
+        self.history_window = history_window
+        self.state_history = StateHistory(self.rooms_num, Observation.SIZE, history_phases, history_window,
+                                          Observation.DTYPE)
+        self.states = Observation.empty(self.rooms_num)  # reused by step() - copied into state_history
 
         self.reset()
 
@@ -42,35 +65,30 @@ class Environment:
         Args:
             room_id: (int) 0 to len()-1
         Returns:
-            tuple of (temperatures, heating_source, desired_temp and time)
+            tuple of (temperatures, heating_source, desired_temp and time) - see Observation
+        """
+        return tuple(self.get_states()[room_id])
+
+    def get_states(self, out=None):
+        """
+        This method is used to get the states of all rooms at once.
+        Args:
+            out (np.ndarray): optional (rooms_num, Observation.SIZE) float32 array to fill
+        Returns:
+            np.ndarray (rooms_num, Observation.SIZE) float32 - (temperatures, heating_source, desired_temp and time)
         """
-        theta = (2 * math.pi * (self.time % self.T_DAY)) / self.T_DAY
-        in_values = self.temp_model[room_id].get_in_values(self.time)
-        out_values = self.temp_model[room_id].get_out_values()
-        state = *in_values, *out_values, self.rooms_desired_temp[room_id], math.sin(theta), math.cos(theta)
-        return state
+        return self.engine.get_states(self.rooms_desired_temp, self.time, out)
 
     def reset(self):
         """
         This method is used to reset the time and return states of the environment.
         Returns:
-            list of tuples of (temperatures, heating_source, desired_temp and time)
+            np.ndarray view (rooms_num, history_window, Observation.SIZE) float32
         """
         self.time = 0
-        states = []
-        actual_states = []
-        self.state_series = []
-        theta = (2 * math.pi * (self.time % self.T_DAY)) / self.T_DAY
-        for tm, rdt in zip(self.temp_model, self.rooms_desired_temp):
-            tm.reset()
-            states.append((*tm.get_in_values(self.time), *tm.get_out_values(), rdt, math.sin(theta), math.cos(theta)))
-        states = np.array(states)
-        # duplicating a single vector into a given array size
-        self.state_series = np.tile(states[:, np.newaxis, np.newaxis, :], (1, 10, 42, 1))  # 10min * 42 = 7h
-        for i in range(self.rooms_num):
-            actual_states.append(self.state_series[i, 0, :, :])
-
-        return np.array(actual_states)
+        self.engine.reset()
+        # duplicating a single vector into all windows
+        return self.state_history.reset(self.get_states())
 
     def step(self, actions, time_step):
         """
@@ -81,38 +99,33 @@ class Environment:
             time_step:   int (adding minutes)
 
         Returns:
-            list of tuples of (temperatures, heating_source, desired_temp and time)
+            np.ndarray view (rooms_num, history_window, Observation.SIZE) float32
+            and rewards (one for each room). The view is overwritten after history_phases steps - copy it to keep it.
         """
         self.time += time_step
-        actual_states = []
-        for i, action in enumerate(actions):
-            self.temp_model[i].step(bool(action), self.time)
-            # adding vector on last position in list and remove first one but doing this once per 10 min.
-            # that makes range of 8 hours (10min * 42 vectors in matrix)
-            new_states = np.vstack([self.state_series[i][self.time % 10][1:], self.get_state(i)])
-            self.state_series[i][self.time % 10] = new_states
-            actual_states.append(new_states)
+        if self.solver == 'exact':
+            self.engine.step_exact(actions, self.time, time_step)
+        else:
+            self.engine.step(actions, self.time)
+        # adding vector on last position in window and remove first one but doing this once per 10 min.
+        # that makes range of 7 hours (10min * 42 vectors in matrix)
+        actual_states = self.state_history.push(self.time % self.history_phases, self.get_states(self.states))
 
-        return np.array(actual_states), self.get_penalty()
+        return actual_states, self.get_penalty()
 
     def get_values(self):
         values = []
-        for tm, rdt in zip(self.temp_model, self.rooms_desired_temp):
-            values.append((rdt, *tm.get_in_values(self.time)))
+        in_values = self.engine.get_in_values(self.time)
+        for i, rdt in enumerate(self.rooms_desired_temp):
+            values.append((float(rdt), *(v[i].item() for v in in_values)))
 
-        values.append((*self.temp_model[0].get_out_values(), self.time))
+        values.append((*(v[0].item() for v in self.engine.get_out_values()), self.time))
         return values
 
     def get_time(self):
         return self.time
 
     def get_penalty(self):
-        penalties = []
-        for tm, rdt in zip(self.temp_model, self.rooms_desired_temp):
-            switch_frequency_penalty = tm.get_switch_heating_difference(self.time)**2
-            penalties.append(100 - (4 * (tm.indoor_temperature - rdt))**2 -
-                             (4 * (max(0, tm.heating_temperature - tm.max_floor_temperature)))**2 -  # max() - penalize only when the floor temperature exceeds the max
-                             max(0, 10 - switch_frequency_penalty))  # max() - penalize only when the switch time is less than 10 minutes
-        return np.array(penalties)
+        return self.engine.get_penalty(self.rooms_desired_temp, self.time)
 
 
@@ -0,0 +1,101 @@
+import itertools
+
+import numpy as np
+
+from main import VectorEnvironment, TwoStateSwitch, Observation
+
+
+class Evaluation:
+    """
+    Headless evaluation of one controller on many scenarios at once. Every scenario is one building
+    of a VectorEnvironment, so the controller gets the observations of all rooms of all scenarios
+    in one batch (e.g. one model forward pass per minute).
+
+    Scenario (dict):
+        desired_temp (float), heating_source_temp (float), sunrise_time (int) and start_time (int) in minutes -
+        outdoor temperature profile (sine shifted by sunrise and the time of day at start), rooms (int),
+        horizon (int) - simulated minutes.
+
+    Metrics (per scenario, mean of its rooms):
+        comfort_error: mean absolute difference of indoor and desired temperature [C]
+        overheating: mean floor temperature above the maximum (ThermalEngine.max_floor_temperature) [C]
+        switches: the number of heating switches
+        heating_minutes: the number of minutes with heating on
+    """
+    METRICS = ('comfort_error', 'overheating', 'switches', 'heating_minutes')
+
+    def __init__(self, scenarios: list, with_random=False, solver='euler', weather=None):
+        """
+        Args:
+            weather (Weather): outdoor temperature with a profile for every sunrise time (daily sine by default).
+        """
+        self.scenarios = scenarios
+        self.env = VectorEnvironment([[s['desired_temp']] * s['rooms'] for s in scenarios], with_random,
+                                     [s['heating_source_temp'] for s in scenarios],
+                                     [s['sunrise_time'] for s in scenarios],
+                                     [s['start_time'] for s in scenarios], solver, weather=weather)
+        self.horizon = np.array([s['horizon'] for s in scenarios], dtype=np.int64)
+
+    @staticmethod
+    def scenario_grid(desired_temps=(21.5,), heating_source_temps=(40.,), sunrise_times=(460,), start_times=(0,),
+                      rooms_counts=(1,), horizons=(2160,)):
+        """
+        Returns:
+            list of scenarios - all combinations of given values
+        """
+        return [{'desired_temp': d, 'heating_source_temp': h, 'sunrise_time': s, 'start_time': t, 'rooms': r,
+                 'horizon': n}
+                for d, h, s, t, r, n in itertools.product(desired_temps, heating_source_temps, sunrise_times,
+                                                          start_times, rooms_counts, horizons)]
+
+    @staticmethod
+    def two_state_controller(env):
+        """
+        Vectorized TwoStateSwitch (the same hysteresis rule for every room).
+
+        Returns:
+            controller(states, env) -> actions
+        """
+        hysteresis = TwoStateSwitch().hysteresis
+        state = np.zeros(env.rooms_num, dtype=bool)
+
+        def controller(states, env):
+            indoor = Observation.latest(states, Observation.INDOOR)
+            state[indoor > env.rooms_desired_temp + hysteresis] = False
+            state[indoor < env.rooms_desired_temp - hysteresis] = True
+            return state.copy()
+
+        return controller
+
+    def run(self, controller):
+        """
+        Simulate all scenarios (until the longest horizon, metrics of every scenario stop at its horizon).
+
+        Args:
+            controller: function(states, env) -> actions of all rooms.
+        Returns:
+            list of dicts - scenario values and metrics
+        """
+        env = self.env
+        engine = env.engine
+        room_horizon = self.horizon[env.building_index]
+        totals = {metric: np.zeros(env.rooms_num) for metric in self.METRICS}
+
+        states = env.reset()
+        heating_on = engine.heating_source_on.copy()
+        for minute in range(int(self.horizon.max())):
+            active = minute < room_horizon
+            states, _ = env.step(controller(states, env), 1)
+
+            totals['comfort_error'] += active * np.abs(engine.indoor_temperature - env.rooms_desired_temp)
+            totals['overheating'] += active * np.maximum(0, engine.heating_temperature - engine.max_floor_temperature)
+            totals['switches'] += active & (engine.heating_source_on != heating_on)
+            totals['heating_minutes'] += active & engine.heating_source_on
+            heating_on = engine.heating_source_on.copy()
+
+        totals['comfort_error'] /= room_horizon
+        totals['overheating'] /= room_horizon
+        rooms = np.bincount(env.building_index)
+        per_scenario = {metric: np.bincount(env.building_index, values) / rooms for metric, values in totals.items()}
+        return [{**scenario, **{metric: float(values[i]) for metric, values in per_scenario.items()}}
+                for i, scenario in enumerate(self.scenarios)]
@@ -0,0 +1,113 @@
+import numpy as np
+
+from .thermal_engine import ThermalEngine
+from .two_state_switch import TwoStateSwitch
+
+
+class EventDrivenSimulation:
+    """
+    Event-driven (fast-forward) simulation of TwoStateSwitch controllers on a ThermalEngine (one controller per room).
+
+    The heater state changes only when the indoor temperature leaves the hysteresis band, so between the switches
+    the exact solution (ExactSolver) is used. For every room the next switch minute is found on a vectorized
+    look-ahead grid (the same one minute decision resolution as the step by step simulation) and the simulation
+    jumps straight to it. Controllers switch only when at least min_switch_time minutes passed from the last switch.
+
+    Attributes:
+        engine (ThermalEngine): the temperature model of all rooms (its state is advanced by run()).
+        desired_temp (np.ndarray): desired temperature of every controller.
+        hysteresis (np.ndarray): hysteresis of every controller.
+        min_switch_time (int): minimal time between switches (in minutes).
+        switch_times (list): list of switch times (in minutes) per room.
+    """
+    LOOKAHEAD = 360  # in minutes
+
+    def __init__(self, engine: ThermalEngine, switches: list):
+        """
+        Constructor
+
+        Args:
+            engine (ThermalEngine): the temperature model of all rooms.
+            switches (list): one TwoStateSwitch per room.
+        """
+        if len(switches) != engine.rooms_num:
+            raise ValueError("One TwoStateSwitch per room is required")
+        engine.check_exact_solver()
+        self.engine = engine
+        self.switches = switches
+        self.desired_temp = np.array([switch.desired_temp for switch in switches], dtype=np.float64)
+        self.hysteresis = np.array([switch.hysteresis for switch in switches], dtype=np.float64)
+        self.min_switch_time = TwoStateSwitch.min_switch_time
+        self.switch_times = [[] for _ in range(engine.rooms_num)]
+
+    def run(self, duration: int, start_time: int = 0, data_dicts: list = None):
+        """
+        Simulate all rooms from start_time to start_time + duration.
+
+        Args:
+            duration (int): simulated time in minutes.
+            start_time (int): engine time at the beginning.
+            data_dicts (list): optional DataDict per room - all minutes are recorded (heating state in given minute).
+
+        Returns:
+            np.ndarray number of switches per room.
+        """
+        engine = self.engine
+        solver = engine.exact_solver
+        rooms = np.arange(engine.rooms_num)
+        end_time = start_time + duration
+        time = np.full(engine.rooms_num, start_time, dtype=np.int64)
+        offsets = np.arange(self.LOOKAHEAD + 1)
+        switches_count = np.zeros(engine.rooms_num, dtype=np.int64)
+        events_room, events_time = [], []
+
+        while np.any(time < end_time):
+            active = rooms[time < end_time]
+            on = engine.heating_source_on[active]
+            indoor, floor = solver.advance(
+                engine.indoor_temperature[active, np.newaxis], engine.heating_temperature[active, np.newaxis],
+                on[:, np.newaxis], engine.heating_source_temp[active, np.newaxis],
+                engine.sunrise_time[active, np.newaxis], time[active, np.newaxis], offsets)
+
+            # decision at minute (time + offset) is based on indoor temperature in that minute
+            too_hot = indoor > (self.desired_temp + self.hysteresis)[active, np.newaxis]
+            too_cold = indoor < (self.desired_temp - self.hysteresis)[active, np.newaxis]
+            wants_switch = np.where(on[:, np.newaxis], too_hot, too_cold)
+            # switch is registered one minute after the decision (as in Environment.step)
+            first_allowed = engine.last_switch_time[active] + self.min_switch_time - 1 - time[active]
+            remaining = end_time - time[active]
+            valid = (wants_switch & (offsets >= first_allowed[:, np.newaxis]) &
+                     (offsets < np.minimum(self.LOOKAHEAD, remaining)[:, np.newaxis]))
+            has_event = valid.any(axis=1)
+            jump = np.where(has_event, valid.argmax(axis=1), np.minimum(self.LOOKAHEAD, remaining))
+
+            if data_dicts is not None:
+                for i, room in enumerate(active):
+                    minutes = slice(0, jump[i])
+                    data_dicts[room].add_many(
+                        time[room] + offsets[minutes], solver.outdoor(engine.sunrise_time[room],
+                                                                      time[room] + offsets[minutes]),
+                        indoor[i, minutes], floor[i, minutes], np.full(jump[i], on[i]))
+
+            # temperatures at the end of the jump are already on the look-ahead grid
+            active_index = np.arange(len(active))
+            engine.indoor_temperature[active] = indoor[active_index, jump]
+            engine.heating_temperature[active] = floor[active_index, jump]
+            time[active] += jump
+
+            switched = active[has_event]
+            engine.heating_source_on[switched] = ~engine.heating_source_on[switched]
+            engine.last_switch_time[switched] = time[switched] + 1
+            switches_count[switched] += 1
+            events_room.append(switched)
+            events_time.append(time[switched])
+
+        if events_room:
+            events_room = np.concatenate(events_room)
+            events_time = np.concatenate(events_time)
+            for room in range(engine.rooms_num):
+                self.switch_times[room].extend(events_time[events_room == room].tolist())
+        for switch, state in zip(self.switches, engine.heating_source_on):
+            switch.switch(bool(state))
+        engine.calculate_outdoor_temperature(end_time)
+        return switches_count
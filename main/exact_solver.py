@@ -0,0 +1,116 @@
+import numpy as np
+
+
+class ExactSolver:
+    """
+    Exact (closed-form) solution of the two-state thermal model under constant heater state
+    and sinusoidal outdoor temperature. \n
+    dT/dt = mu * (H(t) - T(t)) - k * (T(t) - To(t)) \n
+    dH/dt = on * alpha * (Hsrc - H(t)) - beta * (H(t) - T(t)) \n
+    To(t) = out_mean + out_amplitude * sin(w * (t - sunrise)) \n
+    With x = [T, H] this is x' = A x + b(t), so: \n
+    x(t) = xp(t) + expm(A * (t - t0)) * (x(t0) - xp(t0)) \n
+    where xp(t) = c + p * sin(w * (t - sunrise)) + q * cos(w * (t - sunrise)) is the particular solution.
+    All 2x2 matrices are written element-wise, so every argument can be an array (one value per room)
+    and the arguments are broadcast against each other.
+
+    Coefficients are the same per-minute coefficients as in the Euler scheme (time is in minutes).
+    """
+    def __init__(self, k_coef, mu_coef, alpha, beta, out_mean, out_amplitude, period=1440):
+        self.k_coef = k_coef
+        self.mu_coef = mu_coef
+        self.alpha = alpha
+        self.beta = beta
+        self.out_mean = out_mean
+        self.out_amplitude = out_amplitude
+        self.omega = 2 * np.pi / period
+        self._prepare()
+
+    def outdoor(self, sunrise_time, time):
+        """
+        Outdoor temperature To(t) used by the solver.
+        """
+        return self.out_mean + self.out_amplitude * np.sin(self.omega * (time - sunrise_time))
+
+    def system_matrix(self, on):
+        """
+        Returns:
+            (a11, a12, a21, a22) entries of A for the given heater state(s).
+        """
+        on = np.asarray(on, dtype=np.float64)
+        a11 = np.full_like(on, -(self.mu_coef + self.k_coef))
+        a12 = np.full_like(on, self.mu_coef)
+        a21 = np.full_like(on, self.beta)
+        a22 = -(self.beta + on * self.alpha)
+        return a11, a12, a21, a22
+
+    def _prepare(self):
+        """
+        Precompute everything that depends only on the heater state (index 0 - off, 1 - on).
+        """
+        a11, a12, a21, a22 = self.system_matrix([0., 1.])
+        # eigenvalues of A: half_trace +- root
+        self.half_trace = (a11 + a22) / 2
+        self.root = np.sqrt(((a11 - a22) / 2) ** 2 + a12 * a21)
+        self.shifted = (a11 - self.half_trace, a12, a21, a22 - self.half_trace)  # A - half_trace * I
+        # constant part: c = -inv(A) * [k * out_mean, alpha * Hsrc * on]
+        det = a11 * a22 - a12 * a21
+        b1 = self.k_coef * self.out_mean
+        self.const = (-a22 * b1 / det, a21 * b1 / det)
+        self.source_gain = (a12 * self.alpha / det, -a11 * self.alpha / det)  # times on * Hsrc
+        # periodic part: (A^2 + w^2 I) q = -w e ; p = A q / w ; where e = [k * out_amplitude, 0]
+        w2 = self.omega ** 2
+        m11 = a11 * a11 + a12 * a21 + w2
+        m12 = a12 * (a11 + a22)
+        m21 = a21 * (a11 + a22)
+        m22 = a22 * a22 + a12 * a21 + w2
+        scale = self.k_coef * self.out_amplitude / (m11 * m22 - m12 * m21)
+        r1, r2 = scale * m22, -scale * m21  # inv(M) * e
+        self.sin_gain = (-(a11 * r1 + a12 * r2), -(a21 * r1 + a22 * r2))
+        self.cos_gain = (-self.omega * r1, -self.omega * r2)
+
+    def transition(self, on, dt):
+        """
+        expm(A * dt) (A has two distinct, real and negative eigenvalues).
+
+        Returns:
+            (e11, e12, e21, e22) entries of the transition matrix.
+        """
+        on = np.asarray(on, dtype=np.int64)
+        half_trace, root = self.half_trace[on], self.root[on]
+        exp_one = np.exp((half_trace + root) * dt)
+        exp_two = np.exp((half_trace - root) * dt)
+        diag = (exp_one + exp_two) / 2
+        off = (exp_one - exp_two) / (2 * root)
+        s11, s12, s21, s22 = (entry[on] for entry in self.shifted)
+        return diag + off * s11, off * s12, off * s21, diag + off * s22
+
+    def particular(self, on, heating_source_temp, sunrise_time, time):
+        """
+        Particular (steady periodic) solution xp(t).
+
+        Returns:
+            (indoor, floor) temperatures.
+        """
+        on = np.asarray(on, dtype=np.int64)
+        source = on * heating_source_temp
+        angle = self.omega * (time - sunrise_time)
+        sin, cos = np.sin(angle), np.cos(angle)
+        return tuple(const[on] + gain[on] * source + sin_gain[on] * sin + cos_gain[on] * cos
+                     for const, gain, sin_gain, cos_gain in zip(self.const, self.source_gain,
+                                                                self.sin_gain, self.cos_gain))
+
+    def advance(self, indoor, floor, on, heating_source_temp, sunrise_time, time, dt):
+        """
+        Exact temperatures at time + dt starting from (indoor, floor) at time with constant heater state.
+
+        Returns:
+            (indoor, floor) temperatures.
+        """
+        start_indoor, start_floor = self.particular(on, heating_source_temp, sunrise_time, time)
+        end_indoor, end_floor = self.particular(on, heating_source_temp, sunrise_time, time + dt)
+        e11, e12, e21, e22 = self.transition(on, dt)
+        diff_indoor = indoor - start_indoor
+        diff_floor = floor - start_floor
+        return (end_indoor + e11 * diff_indoor + e12 * diff_floor,
+                end_floor + e21 * diff_indoor + e22 * diff_floor)
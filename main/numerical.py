@@ -1,8 +1,8 @@
-import math
-
 import numpy as np
 
 from .data_dict import DataDict
+from .observation import Observation
+from .weather import Weather
 
 
 class TemperatureModel:
@@ -37,10 +37,11 @@ class TemperatureModel:
     alpha = 0.0025
     beta = 0.005
     # room size: 4 * 4 * 2.6 # there are always two outside walls 2 * 4 * 2.6 = 20.8 ; floor area: 4 * 4 = 16m2
-    k_coef = 20.8 * 0.8 * 60 / 651000  # TODO IMPROVE this should depend on the size of the room
-    mu_coef = 16 * 8.45 * 60 / 651000  # TODO IMPROVE this should depend on the size of the room
+    k_coef = 20.8 * 0.8 * 60 / 651000  # reference room, see Building for coefficients of any room geometry
+    mu_coef = 16 * 8.45 * 60 / 651000  # reference room, see Building for coefficients of any room geometry
 
-    def __init__(self, starting_indoor_temp=20, heating_source_temp=40., sunrise_time=460, sub_minute_for_day=True):
+    def __init__(self, starting_indoor_temp=20, heating_source_temp=40., sunrise_time=460, sub_minute_for_day=True,
+                 weather=None):
         """
         Constructor.
 
@@ -48,6 +49,8 @@ class TemperatureModel:
             heating_source_temp (float): temperature reached by the installation.
             sunrise_time (int): sunrise time in minutes.
             sub_minute_for_day (bool): if True the sunrise time will be moved.
+            weather (Weather): outdoor temperature (by default the daily sine, Weather.day_length_drift()
+                moves the sunrise time).
         """
         self.outdoor_temperature = 0.
         self.indoor_temperature = 18.
@@ -56,6 +59,8 @@ class TemperatureModel:
         self.heating_source_temp = heating_source_temp
         self.sunrise_time = sunrise_time
         self.sub_minute_for_day = sub_minute_for_day
+        self.weather = weather or Weather.sine([sunrise_time], self.min_out_temperature, self.min_max_temp_distance)
+        self.weather_profile = self.weather.get_profiles(sunrise_time)
         self.heating_source_on = False
         self.last_switch_time = 0
         self.data_dictionary = DataDict()
@@ -72,21 +77,13 @@ class TemperatureModel:
 
     def calculate_outdoor_temperature(self, time: int):
         """
-        Simple sinus based simulation. Not really accurate.
+        Outdoor temperature from the precomputed weather table (simple sinus based simulation by default,
+        measured data can be loaded by Weather.from_file()).
 
         Args:
             time (int): time in minutes.
         """
-        # TODO later possible add support for the influence of cloud cover on temperature
-        sunrise_time = self.sunrise_time
-        half_temp_diff = self.min_max_temp_distance / 2
-        day_time = 420  # how long the day is
-        # TODO this could be done better (because in real it is not 2 min. per day)
-        # if self.sub_minute_for_day and sunrise_time - time // 1440 > 300 and day_time < 600:
-        #     sunrise_time -= time // 720    # 2 minutes per day
-        #     day_time += time // 360         # if sunrise is one minute earlier and sunset is later that gives 2 min.
-        self.outdoor_temperature = (self.min_out_temperature + half_temp_diff + (day_time / 420) - 1 +
-                                    half_temp_diff * math.sin((2 * math.pi / 1440) * (time % 1440 - sunrise_time)))
+        self.outdoor_temperature = float(self.weather.outdoor(time, self.weather_profile))
 
     def calculate_heating_effect(self, time: int):
         """
@@ -182,10 +179,9 @@ class TemperatureModel:
         Returns:
             (tuple) of floats
         """
-        on_off_time = (time - self.last_switch_time) % 1440
-        theta = (2 * math.pi * on_off_time) / 1440
+        switch_sin, switch_cos = Observation.encode_time(time - self.last_switch_time)
         return (self.indoor_temperature, self.heating_temperature, self.heating_source_on,
-                math.sin(theta), math.cos(theta))
+                float(switch_sin), float(switch_cos))
 
     def get_out_values(self):
         """
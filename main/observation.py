@@ -0,0 +1,68 @@
+import numpy as np
+
+
+class Observation:
+    """
+    Schema of one state vector (one room at one time) - the layout of the last axis of every observation
+    returned by Environment / VectorEnvironment (rooms, window, features). All features are float32.
+
+    Features (offsets):
+        INDOOR (0): indoor temperature [C]
+        FLOOR (1): floor (heating) temperature [C]
+        HEATING_ON (2): heating source state (1. - on, 0. - off)
+        SWITCH_SIN, SWITCH_COS (3, 4): sin and cos of the time since the last switch (1440 min. period)
+        OUTDOOR (5): outdoor temperature [C]
+        DESIRED (6): desired indoor temperature [C]
+        DAY_SIN, DAY_COS (7, 8): sin and cos of the time of day
+
+    Both time features are gathered from TIME_ENCODING - sin (row 0) and cos (row 1) of every minute
+    of the 1440 min. period computed once and shared by all rooms.
+    """
+    DTYPE = np.float32
+    FEATURES = ('indoor', 'floor', 'heating_on', 'switch_sin', 'switch_cos', 'outdoor', 'desired', 'day_sin', 'day_cos')
+    INDOOR, FLOOR, HEATING_ON, SWITCH_SIN, SWITCH_COS, OUTDOOR, DESIRED, DAY_SIN, DAY_COS = range(len(FEATURES))
+    SIZE = len(FEATURES)
+    TIME_PERIOD = 1440
+    TIME_ENCODING = np.stack([np.sin((2 * np.pi * np.arange(TIME_PERIOD)) / TIME_PERIOD),
+                              np.cos((2 * np.pi * np.arange(TIME_PERIOD)) / TIME_PERIOD)])
+    TIME_ENCODING.flags.writeable = False
+
+    @staticmethod
+    def encode_time(minutes):
+        """
+        Args:
+            minutes (int | np.ndarray): time in minutes (any shape, e.g. one value per room).
+        Returns:
+            (sin, cos) of the time in the 1440 min. period - float64 arrays of the shape of minutes
+        """
+        index = np.asarray(minutes) % Observation.TIME_PERIOD
+        return Observation.TIME_ENCODING[0][index], Observation.TIME_ENCODING[1][index]  # 1-D gathers
+
+    @staticmethod
+    def empty(rooms_num: int):
+        """
+        Returns:
+            np.ndarray (rooms_num, SIZE) uninitialized state vectors
+        """
+        return np.empty((rooms_num, Observation.SIZE), dtype=Observation.DTYPE)
+
+    @staticmethod
+    def latest(states, feature: int):
+        """
+        The newest value of one feature for every room.
+
+        Args:
+            states (np.ndarray): (rooms, window, features) observation.
+            feature (int): offset of the feature (e.g. Observation.INDOOR).
+        Returns:
+            np.ndarray (rooms,)
+        """
+        return states[:, -1, feature]
+
+    @staticmethod
+    def as_dict(state):
+        """
+        Returns:
+            dict {feature name: value} of one state vector
+        """
+        return dict(zip(Observation.FEATURES, (float(value) for value in state)))
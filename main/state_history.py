@@ -0,0 +1,73 @@
+import numpy as np
+
+
+class StateHistory:
+    """
+    Preallocated circular buffer with the history of states for all rooms.
+
+    Every room keeps `phases` interleaved windows (one per `time % phases`) of `window` state vectors.
+    Each window is stored twice one after another (mirrored ring buffer), so the ordered window
+    (oldest -> newest) is always a contiguous slice of the buffer and can be returned without copying.
+    Pushing a new vector writes only two rows per room, independent of the window length.
+
+    Attributes:
+        buffer (np.ndarray): (rooms, phases, 2 * window, features) storage.
+        heads (np.ndarray): index of the newest vector for every phase.
+    """
+    def __init__(self, rooms_num: int, features: int, phases: int = 10, window: int = 42, dtype=np.float64):
+        """
+        Constructor
+
+        Args:
+            rooms_num (int): the number of rooms.
+            features (int): length of one state vector.
+            phases (int): the number of interleaved windows (e.g. 10 - one per minute of 10 min. interval).
+            window (int): the number of state vectors in one window (e.g. 42 - 7h for 10 min. interval).
+            dtype: type of stored values.
+        """
+        self.rooms_num = rooms_num
+        self.features = features
+        self.phases = phases
+        self.window = window
+        self.buffer = np.zeros((rooms_num, phases, 2 * window, features), dtype=dtype)
+        self.heads = np.full(phases, window - 1, dtype=np.int64)
+
+    def reset(self, states):
+        """
+        Fill every window of every room with the given state vector (one per room).
+
+        Args:
+            states (np.ndarray): (rooms, features) states.
+        Returns:
+            np.ndarray view (rooms, window, features) of the first phase.
+        """
+        self.buffer[...] = np.asarray(states)[:, np.newaxis, np.newaxis, :]
+        self.heads[:] = self.window - 1
+        return self.get_window(0)
+
+    def push(self, phase: int, states):
+        """
+        Append state vectors (one per room) to the windows of the given phase (the oldest ones are dropped).
+
+        Args:
+            phase (int): index of the window (e.g. time % phases).
+            states (np.ndarray): (rooms, features) states.
+        Returns:
+            np.ndarray view (rooms, window, features) of the updated windows.
+        """
+        head = (self.heads[phase] + 1) % self.window
+        self.heads[phase] = head
+        self.buffer[:, phase, head] = states
+        self.buffer[:, phase, head + self.window] = states
+        return self.get_window(phase)
+
+    def get_window(self, phase: int):
+        """
+        Zero-copy, ordered (oldest -> newest) view of the windows of the given phase.
+        The view is valid until the same phase is pushed again - copy it when it has to be kept longer.
+
+        Returns:
+            np.ndarray view (rooms, window, features).
+        """
+        start = self.heads[phase] + 1
+        return self.buffer[:, phase, start:start + self.window]
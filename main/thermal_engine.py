@@ -0,0 +1,245 @@
+import numpy as np
+
+from .numerical import TemperatureModel
+from .exact_solver import ExactSolver
+from .observation import Observation
+from .weather import Weather
+
+
+class ThermalEngine:
+    """
+    This class is used to model temperatures of many rooms at once (struct-of-arrays version of TemperatureModel).
+    Every attribute is a NumPy array with one entry per room and all rooms are advanced by one vectorized
+    update. The numerical scheme (explicit Euler, one increment per step) is the same as in TemperatureModel.
+    Alternatively step_exact() uses the closed-form solution (ExactSolver) for any time step.
+    With a Building topology the coefficients are derived from the room geometry (per room) and heat flows
+    between neighbouring rooms (the exact solver is not available then - rooms are not independent).
+    The outdoor temperature is read from a precomputed Weather table (the daily sine by default).
+
+    Attributes:
+        rooms_num (int): the number of rooms.
+        starting_indoor_temp (np.ndarray): indoor temperature of simulation starting (per room).
+        heating_source_temp (np.ndarray): some constant temperature (per room).
+        sunrise_time (np.ndarray): sunrise time in minutes (per room).
+        weather (Weather): outdoor temperature tables.
+        weather_profile (np.ndarray): weather profile of every room.
+        outdoor_temperature (np.ndarray): outdoor temperature (from the weather table).
+        indoor_temperature (np.ndarray): numerically approximated.
+        heating_temperature (np.ndarray): numerically approximated.
+        heating_source_on (np.ndarray): bool flags of heating on / off.
+        last_switch_time (np.ndarray): time of the last heating switch in minutes.
+        building (Building | None): topology of rooms (None - independent reference rooms).
+    """
+    min_switch_time = TemperatureModel.min_switch_time
+    max_floor_temperature = TemperatureModel.max_floor_temperature
+    min_out_temperature = TemperatureModel.min_out_temperature
+    min_max_temp_distance = TemperatureModel.min_max_temp_distance
+
+    alpha = TemperatureModel.alpha
+    beta = TemperatureModel.beta
+    k_coef = TemperatureModel.k_coef
+    mu_coef = TemperatureModel.mu_coef
+
+    def __init__(self, starting_indoor_temps, heating_source_temp=40., sunrise_time=460, building=None,
+                 weather=None):
+        """
+        Constructor.
+
+        Args:
+            starting_indoor_temps (array_like): one starting indoor temperature per room.
+            heating_source_temp (float | array_like): temperature reached by the installation.
+            sunrise_time (int | array_like): sunrise time in minutes.
+            building (Building): optional topology of rooms (geometry and shared walls).
+            weather (Weather): outdoor temperature (by default the daily sine of every sunrise time).
+        """
+        self.starting_indoor_temp = np.asarray(starting_indoor_temps, dtype=np.float64).reshape(-1)
+        self.rooms_num = len(self.starting_indoor_temp)
+        self.heating_source_temp = np.broadcast_to(np.asarray(heating_source_temp, dtype=np.float64),
+                                                   (self.rooms_num,)).copy()
+        self.sunrise_time = np.broadcast_to(np.asarray(sunrise_time, dtype=np.int64), (self.rooms_num,)).copy()
+
+        self.outdoor_temperature = np.zeros(self.rooms_num)
+        self.indoor_temperature = np.full(self.rooms_num, 18.)
+        self.heating_temperature = np.full(self.rooms_num, 23.)
+        self.heating_source_on = np.zeros(self.rooms_num, dtype=bool)
+        self.last_switch_time = np.zeros(self.rooms_num, dtype=np.int64)
+        self.weather = weather or Weather.sine(self.sunrise_time, self.min_out_temperature,
+                                               self.min_max_temp_distance)
+        self.weather_profile = self.weather.get_profiles(self.sunrise_time)
+        self.building = building
+        if building is not None:
+            if building.rooms_num != self.rooms_num:
+                raise ValueError("The building topology does not match the number of rooms")
+            self.k_coef = building.k_coef
+            self.mu_coef = building.mu_coef
+        if building is not None or not self.weather.is_sine:
+            self.exact_solver = None
+        else:
+            half_temp_diff = self.min_max_temp_distance / 2
+            self.exact_solver = ExactSolver(self.k_coef, self.mu_coef, self.alpha, self.beta,
+                                            self.min_out_temperature + half_temp_diff, half_temp_diff)
+        self.reset()
+
+    def reset(self, time=0):
+        """
+        Args:
+            time (int | np.ndarray): starting time in minutes (shared or one per room).
+        """
+        # one draw per room in room order - same random sequence as calling TemperatureModel.reset() for each room
+        random_val = np.random.uniform(0, 0.4, size=self.rooms_num)
+        self.indoor_temperature = self.starting_indoor_temp.copy()
+        self.heating_temperature = 24.8 + random_val
+        self.heating_source_on = np.zeros(self.rooms_num, dtype=bool)
+        self.last_switch_time = np.broadcast_to(np.asarray(time, dtype=np.int64), (self.rooms_num,)).copy()
+        self.calculate_outdoor_temperature(time)
+
+    def calculate_outdoor_temperature(self, time):
+        """
+        Outdoor temperature of every room from the weather table (see Weather).
+
+        Args:
+            time (int | np.ndarray): time in minutes (shared or one per room).
+        """
+        self.outdoor_temperature = self.weather.outdoor(time, self.weather_profile)
+
+    def calculate_temperatures(self, time):
+        """
+        Numerical approximation for all temperatures of all rooms based on given time.
+        Indoor temperature is updated first and the floor uses the new indoor value (as in TemperatureModel).
+        """
+        self.calculate_outdoor_temperature(time)
+        h = self.mu_coef * (self.heating_temperature - self.indoor_temperature)
+        change = h - self.k_coef * (self.indoor_temperature - self.outdoor_temperature)
+        if self.building is not None:
+            change += self.building.exchange(self.indoor_temperature)
+        self.indoor_temperature = self.indoor_temperature + change
+        self.heating_temperature = self.heating_temperature + (
+                self.heating_source_on * self.alpha * (self.heating_source_temp - self.heating_temperature) -
+                self.beta * (self.heating_temperature - self.indoor_temperature))
+
+    def switch_heating_source(self, actions, time):
+        """
+        Switch heating of rooms where requested action differs from actual state.
+
+        Args:
+            actions (np.ndarray): bool flags, one per room.
+            time (int | np.ndarray): time in minutes.
+        """
+        switched = self.heating_source_on != actions
+        self.last_switch_time = np.where(switched, time, self.last_switch_time)
+        self.heating_source_on = np.asarray(actions, dtype=bool).copy()
+
+    def step(self, actions, time):
+        """
+        Numerical approximation for all temperatures based on given actions (one per room) and time.
+        """
+        actions = np.asarray(actions).reshape(-1).astype(bool)
+        self.switch_heating_source(actions, time)
+        self.calculate_temperatures(time)
+
+    def step_exact(self, actions, time, time_step):
+        """
+        Exact temperatures after time_step minutes of constant actions (one per room) ending at given time.
+        The switch is registered at the first minute of the interval (as it would be with 1 min. Euler steps).
+        """
+        self.check_exact_solver()
+        actions = np.asarray(actions).reshape(-1).astype(bool)
+        start_time = time - time_step
+        self.switch_heating_source(actions, start_time + 1)
+        self.indoor_temperature, self.heating_temperature = self.exact_solver.advance(
+            self.indoor_temperature, self.heating_temperature, self.heating_source_on,
+            self.heating_source_temp, self.sunrise_time, start_time, time_step)
+        self.calculate_outdoor_temperature(time)
+
+    def get_euler_deviation(self, actions, time, time_step):
+        """
+        Compare (without changing the engine state) the exact solution with the 1 min. Euler path
+        over time_step minutes of constant actions ending at given time.
+
+        Returns:
+            (indoor, floor) arrays - max absolute difference per room.
+        """
+        self.check_exact_solver()
+        saved = (self.indoor_temperature, self.heating_temperature, self.heating_source_on,
+                 self.last_switch_time, self.outdoor_temperature)
+        actions = np.asarray(actions).reshape(-1).astype(bool)
+        start_time = time - time_step
+        minutes = np.arange(1, time_step + 1)
+        exact_indoor, exact_floor = self.exact_solver.advance(
+            self.indoor_temperature[:, np.newaxis], self.heating_temperature[:, np.newaxis], actions[:, np.newaxis],
+            self.heating_source_temp[:, np.newaxis], self.sunrise_time[:, np.newaxis],
+            np.asarray(start_time)[..., np.newaxis], minutes)
+        indoor_dev = np.zeros(self.rooms_num)
+        floor_dev = np.zeros(self.rooms_num)
+        for minute in minutes:
+            self.step(actions, start_time + minute)
+            indoor_dev = np.maximum(indoor_dev, np.abs(self.indoor_temperature - exact_indoor[:, minute - 1]))
+            floor_dev = np.maximum(floor_dev, np.abs(self.heating_temperature - exact_floor[:, minute - 1]))
+
+        (self.indoor_temperature, self.heating_temperature, self.heating_source_on,
+         self.last_switch_time, self.outdoor_temperature) = saved
+        return indoor_dev, floor_dev
+
+    def check_exact_solver(self):
+        if self.exact_solver is None:
+            raise ValueError("The exact solver requires independent rooms (no building topology) "
+                             "and the sine weather")
+
+    def get_switch_heating_difference(self, time):
+        return time - self.last_switch_time
+
+    def get_in_values(self, time):
+        """
+        Get all indoor temperature values and heating source on/off status
+
+        Returns:
+            (tuple) of arrays (indoor, floor, heating on, sin and cos of time from last switch)
+        """
+        switch_sin, switch_cos = Observation.encode_time(time - self.last_switch_time)
+        return (self.indoor_temperature, self.heating_temperature, self.heating_source_on, switch_sin, switch_cos)
+
+    def get_out_values(self):
+        """
+        Get all outdoor temperature
+
+        Returns:
+            (tuple) of arrays
+        """
+        return (self.outdoor_temperature,)
+
+    def get_states(self, rooms_desired_temp, time, out=None):
+        """
+        States of all rooms (in values, out values, desired temperature, sin and cos of the time of day)
+        in the Observation layout.
+
+        Args:
+            rooms_desired_temp (np.ndarray): desired temperature per room.
+            time (int | np.ndarray): time in minutes (shared or one per room).
+            out (np.ndarray): optional (rooms_num, Observation.SIZE) float32 array to fill.
+        Returns:
+            np.ndarray (rooms_num, Observation.SIZE) float32
+        """
+        states = Observation.empty(self.rooms_num) if out is None else out
+        states[:, Observation.INDOOR] = self.indoor_temperature
+        states[:, Observation.FLOOR] = self.heating_temperature
+        states[:, Observation.HEATING_ON] = self.heating_source_on
+        # sin and cos gathered from the shared table
+        states[:, Observation.SWITCH_SIN], states[:, Observation.SWITCH_COS] = Observation.encode_time(
+            time - self.last_switch_time)
+        states[:, Observation.OUTDOOR] = self.outdoor_temperature
+        states[:, Observation.DESIRED] = rooms_desired_temp
+        states[:, Observation.DAY_SIN], states[:, Observation.DAY_COS] = Observation.encode_time(time)
+        return states
+
+    def get_penalty(self, rooms_desired_temp, time):
+        """
+        Reward for every room (the higher the better, 100 is the maximum).
+
+        Args:
+            rooms_desired_temp (np.ndarray): desired temperature per room.
+            time (int | np.ndarray): time in minutes.
+        """
+        switch_frequency_penalty = self.get_switch_heating_difference(time)**2
+        return (100 - (4 * (self.indoor_temperature - rooms_desired_temp))**2 -
+                (4 * np.maximum(0, self.heating_temperature - self.max_floor_temperature))**2 -  # penalize only when the floor temperature exceeds the max
+                np.maximum(0, 10 - switch_frequency_penalty))  # penalize only when the switch time is less than 10 minutes
@@ -0,0 +1,139 @@
+import numpy as np
+
+from main import ThermalEngine, StateHistory, Environment, Observation, Building, Weather
+
+
+class VectorEnvironment:
+    """
+    This class is used to run many independent buildings (environments) in one vectorized ThermalEngine.
+    Rooms of all buildings are stacked, so one reset() / step() returns one observation batch for every room
+    of every building (that can be passed to a single model forward pass).
+
+    Attributes:
+        buildings_num (int): the number of buildings.
+        rooms_num (int): the number of rooms in all buildings.
+        building_index (np.ndarray): building id of every room.
+        rooms_desired_temp (np.ndarray): desired temperature of every room.
+        start_time (np.ndarray): clock of every building at reset (in minutes, e.g. different time of day).
+        time (np.ndarray): clock of every building.
+        elapsed (int): minutes since reset (shared by all buildings).
+        engine (ThermalEngine): the temperature model of all rooms.
+        state_history (StateHistory): preallocated float32 timeseries of states vectors (Observation layout).
+        history_phases (int): the number of interleaved windows per room.
+        history_window (int): the number of state vectors in one window.
+        solver (str): 'euler' (one explicit increment per step) or 'exact' (closed-form solution for any time_step)
+        building (Building | None): topology of all rooms (buildings stacked), None - independent rooms
+    """
+    HISTORY_PHASES = Environment.HISTORY_PHASES
+    HISTORY_WINDOW = Environment.HISTORY_WINDOW
+    SOLVERS = Environment.SOLVERS
+
+    def __init__(self, buildings_desired_temps: list, with_random=True, heating_source_temp=40., sunrise_time=460,
+                 start_time=0, solver='euler', history_phases=HISTORY_PHASES, history_window=HISTORY_WINDOW,
+                 buildings: list = None, weather: Weather = None):
+        """
+        Constructor
+        Args:
+            buildings_desired_temps (list): one list of desired temperatures per building (e.g. [[21., 20.5], [19.]])
+            with_random (bool): if True every building gets its own random offset of starting temperature
+            heating_source_temp (float | list): shared or one per building
+            sunrise_time (int | list): in minutes, shared or one per building
+            start_time (int | list): in minutes, shared or one per building
+            solver (str): 'euler' or 'exact'
+            history_phases (int): the number of interleaved windows (observation is every history_phases minutes)
+            history_window (int): the number of state vectors in one observation
+            buildings (list): optional Building topology per building (None - independent rooms of the building)
+            weather (Weather): outdoor temperature (by default the daily sine, see Weather)
+        """
+        if solver not in self.SOLVERS:
+            raise ValueError(f"Unknown solver: {solver}")
+        self.solver = solver
+        self.buildings_num = len(buildings_desired_temps)
+        rooms_per_building = [len(temps) for temps in buildings_desired_temps]
+        self.building_index = np.repeat(np.arange(self.buildings_num), rooms_per_building)
+        self.rooms_num = len(self.building_index)
+        self.rooms_desired_temp = np.concatenate([np.asarray(temps, dtype=np.float64)
+                                                  for temps in buildings_desired_temps])
+
+        random_val = np.random.uniform(-0.25, 0.25, size=self.buildings_num) if with_random \
+            else np.zeros(self.buildings_num)
+        self.start_time = self.per_building(start_time, np.int64)
+        self.time = self.start_time.copy()
+        self.elapsed = 0
+        self.building = None if buildings is None else Building.concatenate(
+            [building or Building.independent(rooms) for building, rooms in zip(buildings, rooms_per_building)])
+        self.engine = ThermalEngine(self.rooms_desired_temp + random_val[self.building_index],
+                                    self.per_building(heating_source_temp, np.float64)[self.building_index],
+                                    self.per_building(sunrise_time, np.int64)[self.building_index],
+                                    self.building, weather)
+        if solver == 'exact':
+            self.engine.check_exact_solver()
+        self.history_phases = history_phases
+        self.history_window = history_window
+        self.state_history = StateHistory(self.rooms_num, Observation.SIZE, history_phases, history_window,
+                                          Observation.DTYPE)
+        self.states = Observation.empty(self.rooms_num)  # reused by step() - copied into state_history
+
+        self.reset()
+
+    def per_building(self, value, dtype):
+        return np.broadcast_to(np.asarray(value, dtype=dtype), (self.buildings_num,)).copy()
+
+    def get_room_time(self):
+        return self.time[self.building_index]
+
+    def get_states(self, out=None):
+        """
+        Args:
+            out (np.ndarray): optional (rooms_num, Observation.SIZE) float32 array to fill
+        Returns:
+            np.ndarray (rooms_num, Observation.SIZE) float32 - state of every room of every building
+        """
+        return self.engine.get_states(self.rooms_desired_temp, self.get_room_time(), out)
+
+    def reset(self):
+        """
+        This method is used to reset all buildings (clocks go back to start_time).
+        Returns:
+            np.ndarray view (rooms_num, history_window, Observation.SIZE) float32
+        """
+        self.time = self.start_time.copy()
+        self.elapsed = 0
+        self.engine.reset(self.get_room_time())
+        return self.state_history.reset(self.get_states())
+
+    def step(self, actions, time_step):
+        """
+        This method is used to perform one step of all buildings.
+
+        Args:
+            actions:     actions for all rooms (rooms_num,) or (rooms_num, 1)
+            time_step:   int (adding minutes)
+
+        Returns:
+            np.ndarray view (rooms_num, history_window, Observation.SIZE) float32 and rewards (rooms_num,).
+            The view is overwritten after history_phases steps - copy it to keep it.
+        """
+        self.time += time_step
+        self.elapsed += time_step
+        if self.solver == 'exact':
+            self.engine.step_exact(actions, self.get_room_time(), time_step)
+        else:
+            self.engine.step(actions, self.get_room_time())
+        # windows are interleaved by the time since reset, so all buildings share one phase (and one zero-copy view)
+        actual_states = self.state_history.push(self.elapsed % self.history_phases, self.get_states(self.states))
+
+        return actual_states, self.get_penalty()
+
+    def get_penalty(self):
+        return self.engine.get_penalty(self.rooms_desired_temp, self.get_room_time())
+
+    def get_time(self):
+        return self.time
+
+    def split(self, values):
+        """
+        Split per room values (e.g. rewards) into a list with one array per building.
+        """
+        bounds = np.flatnonzero(np.diff(self.building_index)) + 1
+        return np.split(np.asarray(values), bounds)
@@ -0,0 +1,139 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+
+class Weather:
+    """
+    Outdoor temperature precomputed for every minute - one series per profile (e.g. per sunrise time) shared
+    by all rooms, so the outdoor temperature of a step is a table lookup. Tables can be saved and loaded
+    memory-mapped, so worker processes share one copy of a long (e.g. yearly) series.
+
+    Providers:
+        sine() - daily sine (the model of TemperatureModel, ThermalEngine and ExactSolver),
+        day_length_drift() - sine with sunrise moving earlier and days getting longer day by day,
+        from_file() - measured series from a CSV / Parquet file (e.g. saved by DataDict).
+
+    Attributes:
+        table (np.ndarray): (profiles, period) outdoor temperature, time t (in minutes) is at table[:, t % period].
+        period (int): length of the series in minutes.
+        sunrise_time (np.ndarray | None): sunrise time of every profile (None for a single measured series).
+        is_sine (bool): True for the daily sine - the only model supported by the exact solver.
+    """
+    DAY = 1440
+
+    def __init__(self, table, sunrise_time=None, is_sine: bool = False):
+        self.table = table if table.ndim == 2 else table[np.newaxis]
+        self.period = self.table.shape[1]
+        self.sunrise_time = None if sunrise_time is None else np.asarray(sunrise_time, dtype=np.int64)
+        self.is_sine = is_sine
+
+    @property
+    def profiles_num(self):
+        return self.table.shape[0]
+
+    def outdoor(self, time, profile=0):
+        """
+        Args:
+            time (int | np.ndarray): time in minutes (shared or one per room).
+            profile (int | np.ndarray): profile (shared or one per room).
+        Returns:
+            outdoor temperature (float | np.ndarray)
+        """
+        return np.asarray(self.table[profile, time % self.period])
+
+    def get_profiles(self, sunrise_time):
+        """
+        Returns:
+            np.ndarray - profile of every room given by its sunrise time.
+        """
+        sunrise_time = np.asarray(sunrise_time, dtype=np.int64)
+        if self.profiles_num == 1:
+            return np.zeros(sunrise_time.shape, dtype=np.int64)
+        profiles = np.searchsorted(self.sunrise_time, sunrise_time).clip(max=self.profiles_num - 1)
+        if np.any(self.sunrise_time[profiles] != sunrise_time):
+            raise ValueError("No weather profile for the sunrise time of some rooms")
+        return profiles
+
+    @staticmethod
+    def sine(sunrise_times=(460,), min_temperature=-10., temperature_distance=11.):
+        """
+        Daily sine between min_temperature and min_temperature + temperature_distance shifted by the sunrise time
+        (the same values as TemperatureModel.calculate_outdoor_temperature()).
+        """
+        return Weather(Weather._sine_days(np.unique(sunrise_times), 1, min_temperature, temperature_distance),
+                       np.unique(sunrise_times), is_sine=True)
+
+    @staticmethod
+    def day_length_drift(sunrise_times=(460,), days=365, min_temperature=-10., temperature_distance=11.,
+                         min_sunrise_time=300, max_day_time=600):
+        """
+        Sine with the sunrise 2 minutes earlier and the day 4 minutes longer every day (longer day - warmer),
+        until min_sunrise_time or max_day_time is reached. The first day is the same as in sine().
+        """
+        sunrise_times = np.unique(sunrise_times)
+        return Weather(Weather._sine_days(sunrise_times, days, min_temperature, temperature_distance,
+                                          min_sunrise_time, max_day_time), sunrise_times)
+
+    @staticmethod
+    def _sine_days(sunrise_times, days, min_temperature, temperature_distance, min_sunrise_time=None,
+                   max_day_time=None):
+        """
+        Returns:
+            np.ndarray (profiles, days * 1440) - one row per sunrise time
+        """
+        drift = np.arange(days)[np.newaxis, :, np.newaxis]  # (1, days, 1)
+        if min_sunrise_time is not None:  # the drift stops at the limits
+            limit = np.minimum((sunrise_times - min_sunrise_time) // 2, (max_day_time - 420) // 4).clip(min=0)
+            drift = np.minimum(drift, limit[:, np.newaxis, np.newaxis])
+        sunrise_time = sunrise_times[:, np.newaxis, np.newaxis] - 2 * drift
+        day_time = 420 + 4 * drift  # how long the day is
+        minute = np.arange(Weather.DAY)
+        half_temp_diff = temperature_distance / 2
+        table = (min_temperature + half_temp_diff + (day_time / 420) - 1 +
+                 half_temp_diff * np.sin((2 * np.pi / 1440) * (minute - sunrise_time)))
+        return np.broadcast_to(table, (len(sunrise_times), days, Weather.DAY)).reshape(len(sunrise_times), -1)
+
+    @staticmethod
+    def from_file(file: str, temperature_column: str = 'outdoor_temp', time_column: str = 'time'):
+        """
+        Measured series (linearly interpolated to every minute from 0 to the last time in the file).
+        Rows with the same time (e.g. one per room) are averaged.
+        """
+        df = pd.read_parquet(file) if file.endswith(('.parquet', '.pq')) else pd.read_csv(file)
+        series = df.groupby(time_column)[temperature_column].mean()
+        minutes = np.arange(int(series.index.max()) + 1)
+        return Weather(np.interp(minutes, series.index.to_numpy(dtype=np.float64), series.to_numpy(np.float64)))
+
+    def save(self, file: str):
+        """
+        Write the table (.npy file) and its description (<file>.json) - see load().
+        """
+        directory = os.path.dirname(file)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(file, 'wb') as f:
+            np.save(f, np.ascontiguousarray(self.table))
+        with open(file + '.json', 'w') as f:
+            json.dump({'is_sine': self.is_sine,
+                       'sunrise_time': None if self.sunrise_time is None else self.sunrise_time.tolist()}, f)
+
+    @staticmethod
+    def load(file: str):
+        """
+        Memory-mapped table saved by save() (all processes share the same pages).
+        """
+        with open(file + '.json') as f:
+            description = json.load(f)
+        return Weather(np.load(file, mmap_mode='r'), description['sunrise_time'], description['is_sine'])
+
+    @staticmethod
+    def cached(file: str, provider, *args, **kwargs):
+        """
+        Load the table from the file or compute it by provider (e.g. Weather.day_length_drift) and save it first.
+        """
+        if not os.path.exists(file) or not os.path.exists(file + '.json'):
+            provider(*args, **kwargs).save(file)
+        return Weather.load(file)
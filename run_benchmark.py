@@ -0,0 +1,48 @@
+import sys
+
+import numpy as np
+
+from main import Environment
+from ai import A3CModel, Agent, Benchmark
+
+
+ROOMS_COUNTS = [1, 4, 10, 100]
+TRAINING_CONFIGS = {
+    'default': {},
+    'xla': {'jit_compile': True},
+    'bfloat16': {'mixed_precision': 'mixed_bfloat16'},
+    'xla + bfloat16': {'jit_compile': True, 'mixed_precision': 'mixed_bfloat16'},
+}
+TRAINING_DESIRED_TEMPS = [18.5, 18.7, 18.9, 19.2, 19.6, 19.9, 20.4, 20.8, 21.2, 21.5]
+
+
+def run_inference_benchmark():
+    model = A3CModel()
+    # Lazy build
+    model(Environment([21.]).reset())
+    Agent.load_model(model)
+
+    for rooms in ROOMS_COUNTS:
+        env = Environment(list(np.linspace(19., 22., rooms)))
+        states = env.reset()
+        for _ in range(60):  # some history in states
+            states, _ = env.step(np.ones(rooms), 1)
+        Benchmark.print_results(f"Inference latency (one decision for {rooms} rooms):",
+                                Benchmark.inference(model, np.array(states)))
+
+        results, agreement = Benchmark.incremental(model, env)
+        Benchmark.print_results(f"Full window vs incremental (stateful GRU) inference ({rooms} rooms):", results)
+        print(f"  same actions: {100 * agreement:.1f}%")
+
+
+def run_training_benchmark():
+    Benchmark.print_training_results("Training modes (steps/s without the first epoch, reward of trained policy):",
+                                      Benchmark.training(TRAINING_CONFIGS, TRAINING_DESIRED_TEMPS))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'training':
+        run_training_benchmark()
+    else:
+        run_inference_benchmark()
+    sys.exit()
@@ -0,0 +1,216 @@
+import sys
+
+import numpy as np
+
+from ai import Returns
+from main import DataDict, EventDrivenSimulation, ThermalEngine, TwoStateSwitch
+
+
+# exact solver vs Euler
+CHECK_MINUTES = 1440
+SUB_STEPS = 60  # fine Euler steps per minute
+FINE_EULER_TOLERANCE = 1e-3  # [C] - the fine Euler path converges to the exact solution
+EULER_TOLERANCE = 0.05  # [C] - the 1 min. Euler scheme of ThermalEngine
+# event-driven simulation vs minute by minute
+EVENT_MINUTES = 3 * 1440
+EVENT_START_TIME = 300
+EVENT_TOLERANCE = 1e-9  # [C] - both use the exact solution
+# returns vs naive loops
+RETURNS_SHAPE = (50, 3)  # (time, rooms)
+RETURNS_TOLERANCE = 1e-9
+
+
+def fine_euler(engine, indoor, floor, on, start_time, minutes, sub_steps=SUB_STEPS):
+    """
+    Explicit Euler with sub_steps steps per minute of the ODE solved by ExactSolver (constant actions).
+
+    Returns:
+        (indoor, floor) arrays (minutes, rooms) - temperatures at the end of every minute
+    """
+    solver = engine.exact_solver
+    dt = 1. / sub_steps
+    path_indoor, path_floor = [], []
+    for minute in range(minutes):
+        for sub_step in range(sub_steps):
+            outdoor = solver.outdoor(engine.sunrise_time, start_time + minute + sub_step * dt)
+            d_indoor = engine.mu_coef * (floor - indoor) - engine.k_coef * (indoor - outdoor)
+            d_floor = on * engine.alpha * (engine.heating_source_temp - floor) - engine.beta * (floor - indoor)
+            indoor, floor = indoor + dt * d_indoor, floor + dt * d_floor
+        path_indoor.append(indoor)
+        path_floor.append(floor)
+    return np.array(path_indoor), np.array(path_floor)
+
+
+def check_exact_solver():
+    """
+    ExactSolver over one day (rooms with heating on / off, different sunrise and source temperatures)
+    against a fine-step Euler integration and against the 1 min. Euler scheme of ThermalEngine.
+    """
+    np.random.seed(0)
+    engine = ThermalEngine([19., 20.5, 21., 22.], heating_source_temp=[35., 40., 40., 45.],
+                           sunrise_time=[400, 460, 460, 520])
+    on = np.array([True, False, True, False])
+    start_time = 0
+    indoor, floor = engine.indoor_temperature.copy(), engine.heating_temperature.copy()
+
+    exact_indoor, exact_floor = engine.exact_solver.advance(
+        indoor[:, np.newaxis], floor[:, np.newaxis], on[:, np.newaxis], engine.heating_source_temp[:, np.newaxis],
+        engine.sunrise_time[:, np.newaxis], start_time, np.arange(1, CHECK_MINUTES + 1))
+    euler_indoor, euler_floor = fine_euler(engine, indoor, floor, on, start_time, CHECK_MINUTES)
+    fine_deviation = max(np.abs(exact_indoor.T - euler_indoor).max(), np.abs(exact_floor.T - euler_floor).max())
+
+    indoor_dev, floor_dev = engine.get_euler_deviation(on, start_time + CHECK_MINUTES, CHECK_MINUTES)
+    euler_deviation = max(indoor_dev.max(), floor_dev.max())
+
+    # one exact step of the whole day equals chained one minute exact steps
+    engine.step_exact(on, start_time + CHECK_MINUTES, CHECK_MINUTES)
+    chained_indoor, chained_floor = indoor, floor
+    for minute in range(CHECK_MINUTES):
+        chained_indoor, chained_floor = engine.exact_solver.advance(
+            chained_indoor, chained_floor, on, engine.heating_source_temp, engine.sunrise_time,
+            start_time + minute, 1)
+    chained_deviation = max(np.abs(engine.indoor_temperature - chained_indoor).max(),
+                            np.abs(engine.heating_temperature - chained_floor).max())
+
+    print(f"Exact solver: fine Euler deviation {fine_deviation:.2e} C (max {FINE_EULER_TOLERANCE:g}), "
+          f"1 min. Euler deviation {euler_deviation:.2e} C (max {EULER_TOLERANCE:g}), "
+          f"chained steps deviation {chained_deviation:.2e} C")
+    return fine_deviation < FINE_EULER_TOLERANCE and euler_deviation < EULER_TOLERANCE and chained_deviation < 1e-9
+
+
+def event_engine():
+    """
+    Rooms starting out of the hysteresis band (the first switch waits for min_switch_time) and inside it.
+    """
+    np.random.seed(0)
+    engine = ThermalEngine([19., 21.5, 23., 20.5], heating_source_temp=[40., 35., 40., 45.],
+                           sunrise_time=[460, 400, 520, 460])
+    engine.reset(EVENT_START_TIME)
+    return engine, [TwoStateSwitch(desired_temp) for desired_temp in (21.5, 21.5, 22., 20.)]
+
+
+def minute_by_minute(engine, switches, duration, start_time):
+    """
+    TwoStateSwitch.choose_simulation_action() every minute with one minute exact steps - the switch is refused
+    until min_switch_time minutes passed from the last one (registered one minute after the decision).
+
+    Returns:
+        (switch times per room, per room dict of recorded columns as DataDict.data)
+    """
+    solver = engine.exact_solver
+    switch_times = [[] for _ in switches]
+    columns = [{column: [] for column in ('time', 'outdoor_temp', 'indoor_temp', 'heating_temp', 'heating_on')}
+               for _ in switches]
+    for time in range(start_time, start_time + duration):
+        on = engine.heating_source_on.copy()
+        actions = np.array([switch.choose_simulation_action(indoor)
+                            for switch, indoor in zip(switches, engine.indoor_temperature)])
+        actions = np.where(time < engine.last_switch_time + TwoStateSwitch.min_switch_time - 1, on, actions)
+        for room, (switch, action) in enumerate(zip(switches, actions)):
+            switch.switch(bool(action))
+            if action != on[room]:
+                switch_times[room].append(time)
+            for column, value in zip(columns[room].values(), (time, solver.outdoor(engine.sunrise_time[room], time),
+                                                              engine.indoor_temperature[room],
+                                                              engine.heating_temperature[room], action)):
+                column.append(value)
+        engine.step_exact(actions, time + 1, 1)
+    return switch_times, [{column: np.array(values) for column, values in room.items()} for room in columns]
+
+
+def check_event_simulation():
+    """
+    EventDrivenSimulation.run() (jumps between switches) against the minute by minute two-state control:
+    the same switch times, final temperatures and recorded data of every room.
+    """
+    engine, switches = event_engine()
+    simulation = EventDrivenSimulation(engine, switches)
+    data_dicts = [DataDict() for _ in switches]
+    simulation.run(EVENT_MINUTES, EVENT_START_TIME, data_dicts)
+
+    reference_engine, reference_switches = event_engine()
+    switch_times, columns = minute_by_minute(reference_engine, reference_switches, EVENT_MINUTES, EVENT_START_TIME)
+
+    same_switches = simulation.switch_times == switch_times and all(
+        switch.get_state() == reference.get_state() for switch, reference in zip(switches, reference_switches))
+    same_switches &= np.array_equal(engine.heating_source_on, reference_engine.heating_source_on)
+    deviation = max(np.abs(engine.indoor_temperature - reference_engine.indoor_temperature).max(),
+                    np.abs(engine.heating_temperature - reference_engine.heating_temperature).max())
+    for data_dict, expected in zip(data_dicts, columns):
+        recorded = data_dict.data
+        same_switches &= (np.array_equal(recorded['time'], expected['time']) and
+                          np.array_equal(recorded['heating_on'], expected['heating_on']))
+        deviation = max([deviation] + [np.abs(recorded[column] - expected[column]).max()
+                                       for column in ('outdoor_temp', 'indoor_temp', 'heating_temp')])
+
+    first_switches = [times[0] if times else None for times in switch_times]
+    print(f"Event-driven simulation: switches per room {[len(times) for times in switch_times]} "
+          f"(first at {first_switches}), same switch times and data: {same_switches}, "
+          f"temperature deviation {deviation:.2e} C (max {EVENT_TOLERANCE:g})")
+    return same_switches and deviation < EVENT_TOLERANCE
+
+
+def naive_n_step(rewards, next_values, gamma, n):
+    """
+    n-step returns room by room and step by step (sums written out).
+    """
+    length, rooms_num = rewards.shape
+    returns = np.zeros_like(rewards)
+    for room in range(rooms_num):
+        for t in range(length):
+            horizon = min(n, length - t)
+            returns[t, room] = sum(gamma ** k * rewards[t + k, room] for k in range(horizon))
+            returns[t, room] += gamma ** horizon * next_values[t + horizon - 1, room]
+    return returns
+
+
+def naive_gae(rewards, values, next_values, gamma, lam):
+    """
+    GAE as the discounted sum A_t = sum_l (gamma * lam)^l * delta_{t+l} room by room.
+    """
+    length, rooms_num = rewards.shape
+    advantages = np.zeros_like(rewards)
+    for room in range(rooms_num):
+        for t in range(length):
+            advantages[t, room] = sum((gamma * lam) ** l * (rewards[t + l, room] + gamma * next_values[t + l, room] -
+                                                            values[t + l, room])
+                                      for l in range(length - t))
+    return advantages
+
+
+def check_returns():
+    """
+    Returns.n_step and Returns.gae (vectorized reverse scans) against naive loops, also at the segment end
+    (n longer than the segment) and for lam=0 (one-step TD) and lam=1 (bootstrapped Monte Carlo).
+    """
+    np.random.seed(0)
+    rewards = np.random.normal(size=RETURNS_SHAPE)
+    observed_values = np.random.normal(size=(RETURNS_SHAPE[0] + 1, RETURNS_SHAPE[1]))  # V(s_0) ... V(s_T)
+    values, next_values = observed_values[:-1], observed_values[1:]
+    deviation = 0.
+    for gamma, n in [(0.98, 1), (0.98, 5), (0.9, RETURNS_SHAPE[0] + 10)]:
+        advantages, returns = Returns.n_step(rewards, values, next_values, gamma, n)
+        expected = naive_n_step(rewards, next_values, gamma, n)
+        deviation = max(deviation, np.abs(returns - expected).max(), np.abs(advantages - (expected - values)).max())
+    for gamma, lam in [(0.98, 0.95), (0.98, 0.), (0.9, 1.)]:
+        advantages, returns = Returns.gae(rewards, values, next_values, gamma, lam)
+        expected = naive_gae(rewards, values, next_values, gamma, lam)
+        deviation = max(deviation, np.abs(advantages - expected).max(), np.abs(returns - (expected + values)).max())
+
+    # lam=1 equals the n-step return over the whole segment
+    _, gae_returns = Returns.gae(rewards, values, next_values, 0.9, 1.)
+    deviation = max(deviation, np.abs(gae_returns - naive_n_step(rewards, next_values, 0.9, RETURNS_SHAPE[0])).max())
+
+    print(f"Returns: deviation from naive loops {deviation:.2e} (max {RETURNS_TOLERANCE:g})")
+    return deviation < RETURNS_TOLERANCE
+
+
+def main():
+    checks = [check_exact_solver, check_event_simulation, check_returns]
+    failed = [check.__name__ for check in checks if not check()]
+    print("All checks passed" if not failed else f"Failed: {', '.join(failed)}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+import multiprocessing as mp
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from main import Evaluation, Observation, Weather
+
+
+# scenario grid (all combinations)
+DESIRED_TEMPS = (19., 20.5, 21.5, 22.5)
+HEATING_SOURCE_TEMPS = (35., 40.)
+SUNRISE_TIMES = (400, 460, 520)  # outdoor temperature profiles
+START_TIMES = (0, 720)  # midnight / noon
+ROOMS_COUNTS = (1, 4)
+HORIZONS = (1440, 2160)
+SEED = 0
+RESULTS_PATH = 'data/evaluation'
+WEATHER_DAYS = None  # e.g. 365 - sunrise and day length drift instead of the same sine every day
+WEATHER_FILE = 'data/weather/drift_{days}.npy'  # the table is computed once and memory-mapped by all workers
+
+
+def make_controller(name, env):
+    if name == 'two_state':
+        return Evaluation.two_state_controller(env)
+
+    import tensorflow as tf
+    from ai import A3CModel, Agent, Policy
+
+    # one thread per process - processes (not threads) scale with cores
+    tf.config.threading.set_intra_op_parallelism_threads(1)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+    model = A3CModel()
+    # Lazy build on zeros - env.reset() would consume random draws (other starting temperatures than two_state)
+    model(np.zeros((env.rooms_num, env.history_window, Observation.SIZE), dtype=Observation.DTYPE))
+    Agent.load_model(model)
+    # one forward pass for all rooms of all scenarios in the chunk
+    policy = Policy(model, env.history_window, Observation.SIZE)
+    return lambda states, env: policy.choose_actions(states)
+
+
+def evaluate_chunk(controller_name, scenarios):
+    """
+    Evaluate one controller on a chunk of scenarios (in a worker process).
+    """
+    np.random.seed(SEED)  # the same starting temperatures for every controller
+    weather = Weather.load(WEATHER_FILE.format(days=WEATHER_DAYS)) if WEATHER_DAYS else None
+    evaluation = Evaluation(scenarios, weather=weather)
+    rows = evaluation.run(make_controller(controller_name, evaluation.env))
+    return [{'controller': controller_name, **row} for row in rows]
+
+
+def run_evaluation(controllers=('two_state', 'ai'), workers=None):
+    scenarios = Evaluation.scenario_grid(DESIRED_TEMPS, HEATING_SOURCE_TEMPS, SUNRISE_TIMES, START_TIMES,
+                                         ROOMS_COUNTS, HORIZONS)
+    workers = workers or os.cpu_count()
+    # every worker gets a chunk of scenarios per controller (scenarios of one chunk run in one batch)
+    chunks = [list(chunk) for chunk in np.array_split(np.array(scenarios, dtype=object),
+                                                      max(1, workers // len(controllers))) if len(chunk)]
+    print(f"Evaluating {len(scenarios)} scenarios, controllers: {', '.join(controllers)}, workers: {workers}")
+    if WEATHER_DAYS:  # computed once, the workers load it memory-mapped
+        Weather.cached(WEATHER_FILE.format(days=WEATHER_DAYS), Weather.day_length_drift, SUNRISE_TIMES, WEATHER_DAYS)
+
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context('spawn')) as executor:
+        futures = [executor.submit(evaluate_chunk, controller, chunk) for controller in controllers for chunk in chunks]
+        for future in futures:
+            rows += future.result()
+
+    results = pd.DataFrame(rows)
+    scenario_columns = ['desired_temp', 'heating_source_temp', 'sunrise_time', 'start_time', 'rooms', 'horizon']
+    table = results.pivot_table(index=scenario_columns, columns='controller', values=list(Evaluation.METRICS))
+
+    if not os.path.exists(RESULTS_PATH):
+        os.makedirs(RESULTS_PATH)
+    results.to_csv(os.path.join(RESULTS_PATH, 'results.csv'), index=False)
+
+    with pd.option_context('display.max_rows', None, 'display.max_columns', None, 'display.width', 200,
+                           'display.float_format', '{:.3f}'.format):
+        print(table)
+        print("\nMean of all scenarios:")
+        print(results.groupby('controller')[list(Evaluation.METRICS)].mean())
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'two_state':  # without the AI model (no TensorFlow needed)
+        run_evaluation(controllers=('two_state',))
+    else:
+        run_evaluation()
+    sys.exit()
@@ -2,19 +2,21 @@ import sys
 
 import numpy as np
 
-from main import Environment, TwoStateSwitch, DataDict
-from ai import A3CModel, Agent
+from main import Environment, TwoStateSwitch, DataDict, ThermalEngine, EventDrivenSimulation, Observation
+from ai import A3CModel, Agent, Policy
 
 
 COUNT_ROOMS = 1
 TIME_STEPS = 2160  # one day = 1440
+FAST_FORWARD_DAYS = 365
 
 
 def make_step(model, env, state, ai_model=False):
     if ai_model:
-        actions = Agent.choose_simulation_all_action(state, model, False)
+        actions = model.choose_actions(state)
     else:
-        actions = [model.choose_simulation_action(state[0][-1][0]) for _ in range(COUNT_ROOMS)]
+        indoor = Observation.latest(state, Observation.INDOOR)
+        actions = [model.choose_simulation_action(indoor[0]) for _ in range(COUNT_ROOMS)]
 
     state, _ = env.step(actions, 1)  # 1 - one minute
     return state
@@ -37,11 +39,13 @@ def run_silent_mode():
     model_ai(states_ai)
 
     Agent.load_model(model_ai)
+    # compiled inference (one traced graph for all steps)
+    policy_ai = Policy(model_ai, states_ai.shape[-2], states_ai.shape[-1])
 
     for step in range(TIME_STEPS):
-        data_simple.add_data(step, states_simple[0][-1][5], states_simple[0][-1][0], states_simple[0][-1][1], states_simple[0][-1][2])
-        data_ai.add_data(step, states_ai[0][-1][5], states_ai[0][-1][0], states_ai[0][-1][1], states_ai[0][-1][2])
-        states_ai = make_step(model_ai, env_ai, states_ai, ai_model=True)
+        data_simple.record(env_simple)
+        data_ai.record(env_ai)
+        states_ai = make_step(policy_ai, env_ai, states_ai, ai_model=True)
         states_simple = make_step(model_two_state, env_simple, states_simple, ai_model=False)
 
     data_simple.save_data("S2_Temp")
@@ -64,6 +68,30 @@ def run_silent_mode():
     print("Simple model standard deviation: ", np.std(data_simple.data['indoor_temp']))
 
 
+def run_baseline_fast_forward(days=FAST_FORWARD_DAYS):
+    """
+    Event-driven simulation of the simple two-state model (jumps from one switch to the next one).
+    """
+    data_simple = DataDict()
+    rooms_desired_temp = 21.5
+    engine = ThermalEngine([rooms_desired_temp])
+    simulation = EventDrivenSimulation(engine, [TwoStateSwitch(rooms_desired_temp)])
+    switches = simulation.run(days * Environment.T_DAY, data_dicts=[data_simple])
+
+    data_simple.save_data(f"S2_Temp_{days}d")
+
+    print("Desired temperature: ", rooms_desired_temp)
+    print(f"Simple two-state model data ({days} days): ")
+    print("Switches: ", switches[0])
+    print("Temperatures: (min, mean, max)")
+    indoor_temp = np.array(data_simple.data['indoor_temp'])
+    print(indoor_temp.min(), indoor_temp.mean(), indoor_temp.max())
+    print("Simple model standard deviation: ", np.std(indoor_temp))
+
+
 if __name__ == '__main__':
-    run_silent_mode()
+    if len(sys.argv) > 1 and sys.argv[1] == 'ff':  # fast-forward of the simple model
+        run_baseline_fast_forward()
+    else:
+        run_silent_mode()
     sys.exit()
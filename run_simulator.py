@@ -1,26 +1,37 @@
+import os
 import sys
 import pygame
 
 from setup import gui, ai, AppMode
-from main import Environment, TwoStateSwitch
-from ai import A3CModel, Agent
+from main import Environment, TwoStateSwitch, Building, Observation
+from ai import A3CModel, Agent, Policy
 from simulation import Simulator
 
 
 COUNT_ROOMS = 4
+# export (headless) mode
+EXPORT_MINUTES = 1440
+EXPORT_FRAME_SKIP = 5
+EXPORT_PATH = 'data/simulation'
+EXPORT_SIZE = None  # (width, height) - by default the screen size
+EXPORT_VIDEO = None  # e.g. 'simulation.mp4' (ffmpeg) instead of the image sequence
+EXPORT_IMAGE_FORMAT = 'bmp'  # uncompressed - much faster to write than 'png'
 
 
 def make_step(model, env, state):
-    if ai['RUN_MODE'] == AppMode.COMPARE:
-        actions = [model.choose_simulation_action(state) for _ in range(COUNT_ROOMS)]
+    if ai['RUN_MODE'] == AppMode.COMPARE:  # model - one TwoStateSwitch per room
+        indoor = Observation.latest(state, Observation.INDOOR)
+        actions = [switch.choose_simulation_action(indoor[i]) for i, switch in enumerate(model)]
     else:  # if ai['RUN_MODE'] == AppMode.RUN:
-        actions = Agent.choose_simulation_all_action(state, model, False)
+        actions = model.choose_actions(state)
 
     state, _ = env.step(actions, 1)  # 1 - one minute
     return state
 
 
-def run_simulator():
+def run_simulator(export=False):
+    if export:  # no window is needed
+        os.environ['SDL_VIDEODRIVER'] = 'dummy'
     pygame.init()
     screen = pygame.display.set_mode((gui['SCREEN_WIDTH'], gui['SCREEN_HEIGHT']))
     pygame.display.set_caption(gui['WINDOW_TITLE'])
@@ -34,12 +45,13 @@ def run_simulator():
     rooms_desired_temps = [20., 21., 21.5, 22.]
     if len(rooms_desired_temps) != COUNT_ROOMS:
         print('Room numbers do not match!!!!')
-    env = Environment(rooms_desired_temps, False)
+    # rooms are drawn as a grid - neighbouring rooms share walls
+    env = Environment(rooms_desired_temps, False, building=Building.grid(2, COUNT_ROOMS // 2))
     simulator = Simulator(screen, font)
 
     if ai['RUN_MODE'] == AppMode.COMPARE:
         print("Start app in COMPARE mode (simple controller)")
-        model = TwoStateSwitch()
+        model = [TwoStateSwitch(desired_temp) for desired_temp in rooms_desired_temps]
     elif ai['RUN_MODE'] == AppMode.RUN:
         print("Start app in RUN mode (A3C controller)")
         model = A3CModel()
@@ -49,8 +61,15 @@ def run_simulator():
         model(states)
         if run_from_checkpoint:
             Agent.load_model(model)
+        # compiled inference
+        model = Policy(model, states.shape[-2], states.shape[-1])
 
-    simulator.run(model, env, callback=make_step)
+    if export:
+        frames = simulator.export(model, env, make_step, EXPORT_MINUTES, EXPORT_PATH, EXPORT_FRAME_SKIP, EXPORT_SIZE,
+                                  EXPORT_VIDEO, image_format=EXPORT_IMAGE_FORMAT)
+        print(f"Exported {frames} frames to {EXPORT_PATH}")
+    else:
+        simulator.run(model, env, callback=make_step)
 
 
 if __name__ == '__main__':
@@ -59,6 +78,6 @@ if __name__ == '__main__':
         if first_argument == 'c':  # compare
             ai['RUN_MODE'] = AppMode.COMPARE
 
-    run_simulator()
+    run_simulator(export='export' in sys.argv[1:])
     pygame.quit()
     sys.exit()
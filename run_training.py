@@ -1,21 +1,23 @@
 import multiprocessing as mp
 import os
-import queue
+import sys
+import time
 
 import numpy as np
 import tensorflow as tf
 
-from ai import Agent, A3CModel
+from ai import Agent, A3CModel, RolloutBuffer, WeightBroadcast, ActorPool, SegmentQueue, ExperienceStore
 from main import Environment
+from setup import ai
 
 
-def main():
-    num_agents = 10
-    epochs = 30
-    start_from_checkpoint = True
-
-    desired_temps = [18.5, 18.7, 18.9, 19.2, 19.6, 19.9, 20.4, 20.8, 21.2, 21.5]
-
+def prepare_main_model(desired_temps, start_from_checkpoint, model_options=None):
+    """
+    Args:
+        model_options (dict): A3CModel keyword arguments (e.g. jit_compile, mixed_precision).
+    Returns:
+        main model (built and optionally loaded from checkpoint) and the states used to build it.
+    """
     # Dynamic GPU memory allocation for TensorFlow
     gpus = tf.config.experimental.list_physical_devices('GPU')
     if gpus:
@@ -26,7 +28,7 @@ def main():
             print(e)
 
     env = Environment(desired_temps)
-    main_model = A3CModel()
+    main_model = A3CModel(**(model_options or {}))
     # Lazy build
     states = env.reset()
     # here some rooms [len(desired_temps)] are treated as a bach for single room
@@ -37,62 +39,73 @@ def main():
     if start_from_checkpoint and os.listdir(Agent.SAVE_DIR):
         Agent.load_model(main_model)
 
-    manager = mp.Manager()
+    return main_model, states
+
+
+def save_results(main_model, actor_losses, critic_losses, total_losses):
+    # Save last epoch in main localization
+    main_model.save_weights(Agent.SAVE_DIR + Agent.SAVE_FILE)
+    # Save losses
+    Agent.save_losses_csv(actor_losses, critic_losses, total_losses)
+    # Plot losses
+    Agent.plot_losses(actor_losses, critic_losses, total_losses)
+
+
+def main(model_options=None):
+    num_agents = 10
+    epochs = 30
+    start_from_checkpoint = True
+
+    desired_temps = [18.5, 18.7, 18.9, 19.2, 19.6, 19.9, 20.4, 20.8, 21.2, 21.5]
+
+    main_model, states = prepare_main_model(desired_temps, start_from_checkpoint, model_options)
+
+    # agents write experiences directly to shared memory (one part per agent)
+    rollout_buffer = RolloutBuffer(num_agents, Agent.EXP_COUNTER, len(desired_temps),
+                                   states.shape[-2], states.shape[-1])
+    # agents read new weights from shared memory (published once per epoch)
+    weight_broadcast = WeightBroadcast(main_model.get_weights())
+    agents_desired_temps = [np.array(desired_temps) + 0.11 * (a + 1) for a in range(num_agents)]
+    # debug mode - all experiences are stored on disk (for offline training, see main_offline())
+    experience_store = ExperienceStore(Agent.EXPERIENCE_DIR) if ai['DEBUG'] else None
+
+    # Prepare and run agents (multiprocessing) - they stay alive for all epochs
+    print("Creating Agents")
+    actor_pool = ActorPool(agents_desired_temps, weight_broadcast, rollout_buffer)
+    actor_pool.start()
+
     actor_losses = []
     critic_losses = []
     total_losses = []
 
     for i in range(epochs):
-        print("Creating Agents")
-        weights_queue = manager.Queue()
-        experience_queue = manager.Queue()
-        agents = []
-        main_model_weights = main_model.get_weights()
-        desired_temps = [18.5, 18.7, 18.9, 19.2, 19.6, 19.9, 20.4, 20.8, 21.2, 21.5]
-        experiences = []
-
-        # Prepare and run agents (multiprocessing)
-        for a in range(num_agents):
-            weights_queue.put(main_model_weights)
-            desired_temps = np.array(desired_temps) + 0.11
-            print("Creating Agent ", a)
-            agent_process = mp.Process(target=Agent.learn,
-                                       args=(a, weights_queue, experience_queue, desired_temps))
-            agents.append(agent_process)
-            agent_process.start()
+        actor_pool.run_epoch(main_model.get_weights())
 
         print(f"Starting training epoch: {i}")
 
         # For progress monitoring
-        total_steps = Agent.EXP_COUNTER * num_agents
+        while not rollout_buffer.wait(timeout=60):
+            actual_step, total_steps = rollout_buffer.get_progress()
+            print(f'\rEpoch: {i} --> {100 * actual_step // total_steps}% Complete ', end='')
 
-        while True:
-            try:
-                data = experience_queue.get(timeout=60)
-                experiences.append(data)
-            except queue.Empty:
-                print("Empty queue")
-            except EOFError:
-                print("Queue read error")
+            if not actor_pool.is_alive():
+                print("Agents finished without completing the epoch")
+                break
 
-            actual_step = len(experiences)
-
-            if actual_step >= total_steps:
-                print(f'\rEpoch: {i} --> 100% Complete ')
-                print("Total experiences:", len(experiences))
-                break  # when collect all
-
-        # Fin
-        for agent in agents:
-            agent.join()
+        actual_step, total_steps = rollout_buffer.get_progress()
+        print(f'\rEpoch: {i} --> {100 * actual_step // total_steps}% Complete ')
+        print("Total experiences:", actual_step)
 
         # Some logs.
         print(f'Epoch {i} finished. Updating main model weights')
-        rewards = [reward for _, _, _, reward, _ in experiences]
+        experiences = rollout_buffer.get_experiences()
+        rewards = experiences[3]
         print(f'Average reward: {np.mean(rewards)}')
         print(f'Max reward: {np.max(rewards)}')
         print(f'Min reward: {np.min(rewards)}')
         print(f'Rewards shape: {np.array(rewards).shape}')
+        if experience_store is not None:
+            experience_store.save(experiences, i)
 
         # Update the main model based on the experiences collected from agents.
         actor_loss, critic_loss, total_loss = Agent.unpack_exp_and_step(main_model, experiences, i)
@@ -102,18 +115,154 @@ def main():
 
         print(f"Actual learning rate: {main_model.learning_rate}")
         print(f"Actual clip norm: {main_model.clip_norm}")
+        print(f"Training function traces: {main_model.trace_count}")
         print(f"Losses:\n t - {total_losses} ;\n a - {actor_losses} ;\n c - {critic_losses}")
 
         if i > 0 and i % 5 == 0:  # save interval - 5 epochs
             epoch_dir = f'epoch_{i}/'
             main_model.save_weights(Agent.SAVE_DIR+epoch_dir+Agent.SAVE_FILE)
 
-    # Save last epoch in main localization
-    main_model.save_weights(Agent.SAVE_DIR + Agent.SAVE_FILE)
-    # Save losses
-    Agent.save_losses_csv(actor_losses, critic_losses, total_losses)
-    # Plot losses
-    Agent.plot_losses(actor_losses, critic_losses, total_losses)
+    actor_pool.stop()
+    del experiences, rewards
+    rollout_buffer.close()
+    rollout_buffer.unlink()
+    weight_broadcast.close()
+    weight_broadcast.unlink()
+
+    save_results(main_model, actor_losses, critic_losses, total_losses)
+
+
+def main_async(max_staleness=2, segment_len=100, segments_per_agent=4, publish_interval=None, report_interval=30.,
+               model_options=None):
+    """
+    Asynchronous training: agents keep streaming segments (segment_len steps) and the learner keeps training
+    on them and publishing new weights (every publish_interval updates).
+    Segments collected with weights older than max_staleness versions are dropped.
+    One epoch is the same amount of experiences as in main().
+
+    While one agent collects a segment, the learner trains on about one segment of every other agent,
+    so by default weights are published once per num_agents updates - a segment is then usually
+    at most one version old (with publish_interval=1 it would be ~num_agents versions old and dropped).
+    """
+    num_agents = 10
+    publish_interval = publish_interval or num_agents
+    epochs = 30
+    start_from_checkpoint = True
+
+    desired_temps = [18.5, 18.7, 18.9, 19.2, 19.6, 19.9, 20.4, 20.8, 21.2, 21.5]
+
+    main_model, states = prepare_main_model(desired_temps, start_from_checkpoint, model_options)
+
+    segment_queue = SegmentQueue(num_agents, segments_per_agent, segment_len, len(desired_temps),
+                                 states.shape[-2], states.shape[-1])
+    weight_broadcast = WeightBroadcast(main_model.get_weights())
+    agents_desired_temps = [np.array(desired_temps) + 0.11 * (a + 1) for a in range(num_agents)]
+
+    print("Creating Agents")
+    actor_pool = ActorPool(agents_desired_temps, weight_broadcast, segment_queue, worker=Agent.async_actor_worker)
+    actor_pool.start()
+    learner_version = weight_broadcast.publish(main_model.get_weights())
+
+    updates_per_epoch = max(1, num_agents * Agent.EXP_COUNTER // segment_len)
+    actor_losses = []
+    critic_losses = []
+    total_losses = []
+    epoch_losses = []
+    epoch_rewards = []
+    updates, dropped, steps = 0, 0, 0
+    epoch_received, epoch_dropped = 0, 0
+    start_time = report_time = time.monotonic()
+
+    print("Starting asynchronous training")
+    while updates < epochs * updates_per_epoch:
+        ready = segment_queue.get_ready_segments()
+        if not ready:
+            if not actor_pool.is_alive():
+                print("Agents finished without completing the training")
+                break
+            time.sleep(SegmentQueue.POLL_INTERVAL)
+            continue
+
+        for agent_id, slot, version in ready:
+            steps += segment_len
+            epoch_received += 1
+            if learner_version - version > max_staleness:  # too old weights
+                dropped += 1
+                epoch_dropped += 1
+                segment_queue.release(agent_id, slot)
+                continue
+
+            epoch = updates // updates_per_epoch
+            experiences = segment_queue.get_segment(agent_id, slot)
+            epoch_rewards.append(float(np.mean(experiences[3])))
+            epoch_losses.append(Agent.train_on_segment(main_model, experiences, epoch))
+            segment_queue.release(agent_id, slot)
+            updates += 1
+
+            if updates % publish_interval == 0:
+                learner_version = weight_broadcast.publish(main_model.get_weights())
+
+            if updates % updates_per_epoch == 0:
+                actor_loss, critic_loss, total_loss = np.mean(epoch_losses, axis=0)
+                actor_losses.append(actor_loss)
+                critic_losses.append(critic_loss)
+                total_losses.append(total_loss)
+                print(f'Epoch {epoch} finished. Average reward: {np.mean(epoch_rewards)}, '
+                      f'dropped segments: {epoch_dropped}/{epoch_received} ({epoch_dropped / epoch_received:.1%})')
+                print(f"Losses:\n t - {total_losses} ;\n a - {actor_losses} ;\n c - {critic_losses}")
+                epoch_losses, epoch_rewards = [], []
+                epoch_received, epoch_dropped = 0, 0
+
+                if epoch > 0 and epoch % 5 == 0:  # save interval - 5 epochs
+                    epoch_dir = f'epoch_{epoch}/'
+                    main_model.save_weights(Agent.SAVE_DIR + epoch_dir + Agent.SAVE_FILE)
+
+        now = time.monotonic()
+        if now - report_time >= report_interval:
+            elapsed = now - start_time
+            print(f'Throughput: {steps / elapsed:.1f} steps/s ({steps * len(desired_temps) / elapsed:.1f} rooms/s), '
+                  f'{updates / elapsed:.2f} updates/s, dropped segments: {dropped}, weights version: {learner_version}')
+            report_time = now
+
+    actor_pool.stop()
+    segment_queue.close()
+    segment_queue.unlink()
+    weight_broadcast.close()
+    weight_broadcast.unlink()
+
+    save_results(main_model, actor_losses, critic_losses, total_losses)
+
+
+def main_offline(epochs=30, last_shards=None, model_options=None):
+    """
+    Training on experiences stored by earlier runs (ExperienceStore - e.g. main() with ai['DEBUG']).
+    Shards are memory-mapped and every epoch trains on all of them (or on the last_shards) in a new random order.
+    """
+    start_from_checkpoint = True
+
+    experience_store = ExperienceStore(Agent.EXPERIENCE_DIR)
+    names = experience_store.select(last=last_shards)
+    experiences = experience_store.replay(names)
+    print(f"Replaying {len(names)} shards ({len(experiences[1])} experiences)")
+
+    main_model, _ = prepare_main_model([21.], start_from_checkpoint, model_options)
+
+    actor_losses = []
+    critic_losses = []
+    total_losses = []
+
+    for i in range(epochs):
+        actor_loss, critic_loss, total_loss = Agent.unpack_exp_and_step(main_model, experiences, i)
+        actor_losses.append(actor_loss)
+        critic_losses.append(critic_loss)
+        total_losses.append(total_loss)
+        print(f'Epoch {i} finished. Losses: t - {total_loss} ; a - {actor_loss} ; c - {critic_loss}')
+
+        if i > 0 and i % 5 == 0:  # save interval - 5 epochs
+            epoch_dir = f'epoch_{i}/'
+            main_model.save_weights(Agent.SAVE_DIR + epoch_dir + Agent.SAVE_FILE)
+
+    save_results(main_model, actor_losses, critic_losses, total_losses)
 
 
 if __name__ == "__main__":
@@ -121,6 +270,18 @@ if __name__ == "__main__":
 
     Agent.check_save_dir()
 
-    main()
+    # opt-in performance modes of the learner: xla (XLA compilation), bf16 (bfloat16 mixed precision)
+    options = {}
+    if 'xla' in sys.argv[1:]:
+        options['jit_compile'] = True
+    if 'bf16' in sys.argv[1:]:
+        options['mixed_precision'] = 'mixed_bfloat16'
+
+    if 'offline' in sys.argv[1:]:
+        main_offline(model_options=options)
+    elif 'async' in sys.argv[1:]:
+        main_async(model_options=options)
+    else:
+        main(model_options=options)
 
     print("Done!")
@@ -11,7 +11,8 @@ gui = {
     'SCREEN_WIDTH': 1000,
     'SCREEN_HEIGHT': 750,
     'WINDOW_TITLE': 'Heating Controller',
-    'FRAME_RATE': 1,
+    'FRAME_RATE': 1,  # initial speed (simulated minutes per second)
+    'DISPLAY_RATE': 30,  # frames per second
     'FONT_PATH': "media/fonts/Lato-Regular.ttf"
 }
 
@@ -1,10 +1,26 @@
+import math
+import os
+import shutil
+import subprocess
+import threading
+import time
+
 import pygame
 
 from setup import gui
 
 
 class Simulator:
-    """Simulate building floor with 4 rooms"""
+    """
+    Simulate building floor with any number of rooms.
+
+    The environment is stepped in a separate thread at the chosen speed (simulated minutes per real second,
+    'max' - as fast as possible) and the window shows the latest state at the display rate. Only changed parts
+    of the screen are redrawn (dirty rectangles) and text is composed of cached glyph surfaces.
+
+    export() renders frames without a window (screen can be any surface, e.g. with the SDL dummy video driver)
+    as fast as the environment is stepped and saves them as an image sequence or a video (ffmpeg).
+    """
     WHITE = (255, 255, 255)
     BLACK = (0, 0, 0)
     GREEN = (20, 225, 20)
@@ -12,34 +28,87 @@ class Simulator:
     GRAY = (196, 196, 196)
     LIGHT_GREEN = (140, 255, 140)
     DARK_GREEN = (20, 120, 20)
-    room_width, room_height = 300, 250
+    room_width, room_height = 300, 250  # maximum size of a room
+    rooms_x, rooms_y = 150, 200  # top left corner of the rooms grid
+    rooms_right, rooms_bottom = 250, 50  # margins of the rooms grid (buttons and legend)
     texts_inside = ["Desired temp: ", "Indoor temp: ", "Floor temp: "]
+    texts_inside_short = ["Set: ", "In: ", "Floor: "]  # narrow rooms
     texts_outside = ["Outside temperature: "]
+    speeds = (1, 10, 20, 1000, None)  # simulated minutes per second (None - max)
 
     def __init__(self, screen, font):
         self.screen = screen
         self.font = font
-        self.frame_rate = gui['FRAME_RATE']
-        self.buttons = [
-            {"rect": pygame.Rect(gui['SCREEN_WIDTH'] - 180, 40, 35, 35), "text": "1x", "speed": 1},
-            {"rect": pygame.Rect(gui['SCREEN_WIDTH'] - 140, 40, 35, 35), "text": "10x", "speed": 10},
-            {"rect": pygame.Rect(gui['SCREEN_WIDTH'] - 100, 40, 35, 35), "text": "20x", "speed": 20}
-        ]
+        self.speed = gui['FRAME_RATE']
+        self.display_rate = gui['DISPLAY_RATE']
+        self.glyphs = {}  # (char, color) -> rendered surface
+        self.buttons = []
+        x = gui['SCREEN_WIDTH'] - 60 - sum(max(35, font.size(self._speed_text(s))[0] + 10) + 5 for s in self.speeds)
+        for speed in self.speeds:
+            text = self._speed_text(speed)
+            width = max(35, font.size(text)[0] + 10)
+            self.buttons.append({"rect": pygame.Rect(x, 40, width, 35), "text": text, "speed": speed})
+            x += width + 5
+
+        self.lock = threading.Lock()  # the environment is stepped or read
+        self.stop = threading.Event()
+        self.steps = 0  # simulated minutes
+        self.error = None
+
+    @staticmethod
+    def _speed_text(speed):
+        return "max" if speed is None else f"{speed}x"
+
+    @staticmethod
+    def layout(rooms_num: int):
+        """
+        Grid of rooms (as square as possible) inside the rooms area of the screen.
+
+        Returns:
+            list of pygame.Rect - one per room
+        """
+        columns = math.ceil(math.sqrt(rooms_num))
+        rows = math.ceil(rooms_num / columns)
+        area_width = gui['SCREEN_WIDTH'] - Simulator.rooms_x - Simulator.rooms_right
+        area_height = gui['SCREEN_HEIGHT'] - Simulator.rooms_y - Simulator.rooms_bottom
+        width = min(Simulator.room_width, area_width // columns)
+        height = min(Simulator.room_height, area_height // rows)
+        return [pygame.Rect(Simulator.rooms_x + (i % columns) * width, Simulator.rooms_y + (i // columns) * height,
+                            width, height)
+                for i in range(rooms_num)]
+
+    def glyph(self, char, color):
+        surface = self.glyphs.get((char, color))
+        if surface is None:
+            surface = self.glyphs[(char, color)] = self.font.render(char, True, color)
+        return surface
+
+    def draw_text(self, text, x, y, color=BLACK):
+        """
+        Blit text glyph by glyph (glyphs are rendered once).
+
+        Returns:
+            pygame.Rect of the text
+        """
+        start = x
+        for char in text:
+            surface = self.glyph(char, color)
+            self.screen.blit(surface, (x, y))
+            x += surface.get_width()
+        return pygame.Rect(start, y, x - start, self.font.get_height())
 
     def draw_buttons(self):
-        img = self.font.render("For '1x' one second (real) is one minute for environment", True, self.BLACK)
-        self.screen.blit(img, (gui['SCREEN_WIDTH'] // 2, 10))
         for button in self.buttons:
-            if button["speed"] == self.frame_rate:
+            if button["speed"] == self.speed:
                 pygame.draw.rect(self.screen, self.LIGHT_GREEN, button["rect"])
                 pygame.draw.rect(self.screen, self.DARK_GREEN, button["rect"], 2)  # Frame
             else:
                 pygame.draw.rect(self.screen, self.GRAY, button["rect"])
                 pygame.draw.rect(self.screen, self.BLACK, button["rect"], 2)  # Frame
 
-            text_surface = self.font.render(button["text"], True, self.BLACK)
-            text_rect = text_surface.get_rect(center=button["rect"].center)
-            self.screen.blit(text_surface, text_rect)
+            width, height = self.font.size(button["text"])
+            self.draw_text(button["text"], button["rect"].centerx - width // 2, button["rect"].centery - height // 2)
+        return self.buttons[0]["rect"].unionall([button["rect"] for button in self.buttons])
 
     def draw_led(self, x, y, status):
         color = self.RED if status else self.GRAY
@@ -48,82 +117,186 @@ class Simulator:
     def draw_screen_legend(self):
         x = gui['SCREEN_WIDTH'] - 160
         y = gui['SCREEN_HEIGHT'] - 200
-        img = self.font.render("LEGEND", True, self.BLACK)
-        self.screen.blit(img, (x - 20, y - 30))
+        self.draw_text("LEGEND", x - 20, y - 30)
         self.draw_led(x, y + 12, True)
-        img = self.font.render("Heating ON", True, self.BLACK)
-        self.screen.blit(img, (x + 12, y))
+        self.draw_text("Heating ON", x + 12, y)
         y += 30
         self.draw_led(x, y + 12, False)
-        img = self.font.render("Heating OFF", True, self.BLACK)
-        self.screen.blit(img, (x + 12, y))
-
-    def draw_room(self, x, y, width, height, values):
-        pygame.draw.rect(self.screen, self.BLACK, [x, y, width, height], 2)
-        text_height = y + 10
-        self.draw_led(x + width - 15, text_height + 5, values[3])
-        for val, desc in zip(values, self.texts_inside):
+        self.draw_text("Heating OFF", x + 12, y)
+
+    def draw_room(self, rect, values):
+        self.screen.fill(self.WHITE, rect)
+        self.screen.set_clip(rect)  # text of small rooms
+        pygame.draw.rect(self.screen, self.BLACK, rect, 2)
+        text_height = rect.y + 10
+        self.draw_led(rect.right - 15, text_height + 5, values[3])
+        texts = self.texts_inside if rect.width >= self.room_width * 2 // 3 else self.texts_inside_short
+        for val, desc in zip(values, texts):
             if isinstance(val, float):
                 val = round(val, 2)
-            img = self.font.render(desc + str(val) + " °C", True, self.BLACK)
-            self.screen.blit(img, (x + 10, text_height))
-            text_height += img.get_height() + 10
-
-    def draw_outside(self, width, height, values):
-        x, y = 0, 0
-        text_height = y + 10
-        pygame.draw.rect(self.screen, self.BLACK, [x, y, width, height], 2)
+            text_height += self.draw_text(desc + str(val) + " °C", rect.x + 10, text_height).height + 10
+        self.screen.set_clip(None)
+        return rect
+
+    def draw_outside(self, width, height, values, speed=None):
+        rect = pygame.Rect(0, 0, width, height)
+        self.screen.fill(self.WHITE, rect)
+        text_height = rect.y + 10
+        pygame.draw.rect(self.screen, self.BLACK, rect, 2)
         for val, desc in zip(values, self.texts_outside):
             if isinstance(val, float):
                 val = round(val, 2)
-            img = self.font.render(desc + str(val) + " °C", True, self.BLACK)
-            self.screen.blit(img, (x + 10, text_height))
-            text_height += img.get_height() + 10
+            text_height += self.draw_text(desc + str(val) + " °C", rect.x + 10, text_height).height + 10
 
         val = values[1]
         desc = "Time (dd:hh:mm): "
         val = "{:02} : {:02} : {:02}".format(val // 1440, (val % 1440) // 60, val % 60)
-        img = self.font.render(desc + str(val), True, self.BLACK)
-        self.screen.blit(img, (x + 10, text_height))
-        text_height += img.get_height() + 10
+        text_height += self.draw_text(desc + str(val), rect.x + 10, text_height).height + 10
+        if speed is not None:
+            self.draw_text(f"Speed: {speed} min/s", rect.x + 10, text_height)
+        return rect
 
-    def run(self, model, env, callback):
-        running = True
-        clock = pygame.time.Clock()
+    def draw(self, values, previous=None, speed=None, previous_speed=None):
+        """
+        Draw rooms and outside values which differ from the previous ones (everything without previous values).
 
-        state = env.reset()
+        Returns:
+            list of pygame.Rect - changed parts of the screen
+        """
+        rects = []
+        if previous is None:
+            self.screen.fill(self.WHITE)
+            self.draw_text("For '1x' one second (real) is one minute for environment", gui['SCREEN_WIDTH'] // 2, 10)
+            self.draw_screen_legend()
+            self.draw_buttons()
+            rects.append(self.screen.get_rect())
 
-        while running:
-            values = env.get_values()
+        rooms = values[:-1]
+        for rect, room, old in zip(self.layout(len(rooms)), rooms, previous or [None] * len(rooms)):
+            if room != old:
+                rects.append(self.draw_room(rect, room))
+        if previous is None or values[-1] != previous[-1] or speed != previous_speed:
+            rects.append(self.draw_outside(self.room_width, 130, values[-1], speed))
+        return rects
 
-            state = callback(model, env, state)
+    def simulate(self, model, env, callback, state):
+        """
+        Step the environment (in the simulation thread) at self.speed until stop is set.
+        """
+        try:
+            paced_speed, start, steps = None, 0., 0
+            while not self.stop.is_set():
+                speed = self.speed
+                if speed is not None:
+                    if speed != paced_speed:
+                        paced_speed, start, steps = speed, time.perf_counter(), 0
+                    ahead = (steps + 1) / speed - (time.perf_counter() - start)
+                    if ahead > 0:
+                        time.sleep(min(ahead, 0.05))  # short sleeps - a speed change is applied at once
+                        continue
+                with self.lock:
+                    state = callback(model, env, state)
+                steps += 1
+                self.steps += 1
+                paced_speed = speed
+        except Exception as e:  # re-raised in the GUI thread
+            self.error = e
+            self.stop.set()
 
-            self.screen.fill(self.WHITE)
+    def run(self, model, env, callback):
+        clock = pygame.time.Clock()
 
-            self.draw_buttons()
-            self.draw_screen_legend()
+        state = env.reset()
+        self.stop.clear()
+        thread = threading.Thread(target=self.simulate, args=(model, env, callback, state), daemon=True)
+        thread.start()
 
-            # rooms
-            start_x, start_y = 150, 200
-            self.draw_room(start_x, start_y, self.room_width, self.room_height, values[0])
-            self.draw_room(start_x + self.room_width, start_y, self.room_width, self.room_height, values[1])
-            self.draw_room(start_x, start_y + self.room_height, self.room_width, self.room_height, values[2])
-            self.draw_room(start_x + self.room_width, start_y + self.room_height, self.room_width, self.room_height,
-                           values[3])
+        previous, previous_speed = None, None
+        sampled_time, sampled_steps, speed = time.perf_counter(), 0, 0.
+        while not self.stop.is_set():
+            with self.lock:
+                values = env.get_values()
 
-            # outside
-            self.draw_outside(self.room_width, 100, values[4])
+            now = time.perf_counter()
+            if now - sampled_time >= 1.:  # measured speed (simulated minutes per second)
+                speed = round((self.steps - sampled_steps) / (now - sampled_time))
+                sampled_time, sampled_steps = now, self.steps
+            rects = self.draw(values, previous, speed, previous_speed)
+            previous, previous_speed = values, speed
 
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
-                    running = False
+                    self.stop.set()
                 elif event.type == pygame.MOUSEBUTTONDOWN:
                     if event.button == 1:  # LPM
                         for button in self.buttons:
                             if button["rect"].collidepoint(event.pos):
-                                self.frame_rate = button["speed"]
-                                print(f"Actual frame rate: {self.frame_rate}")
+                                self.speed = button["speed"]
+                                rects.append(self.draw_buttons())
+                                print(f"Actual speed: {self._speed_text(self.speed)}")
+
+            pygame.display.update(rects)
+            clock.tick(self.display_rate)
 
-            clock.tick(self.frame_rate)
+        thread.join()
+        if self.error is not None:
+            raise self.error
 
-            pygame.display.update()
+    def export(self, model, env, callback, minutes: int = 1440, path: str = 'data/simulation', frame_skip: int = 1,
+               size=None, video: str = None, fps: int = 30, image_format: str = 'png'):
+        """
+        Simulate given minutes and save every frame_skip-th frame (the first frame is the state after reset).
+
+        Args:
+            path (str): directory of the image sequence (frame_000000.<image_format>, ...) or of the video.
+            size (tuple): (width, height) of frames (by default the size of the screen).
+            video (str): file name of the video (e.g. 'simulation.mp4') instead of the image sequence,
+                frames are piped to ffmpeg at fps frames per second (yuv420p - size is rounded down to even values).
+        Returns:
+            int: the number of saved frames
+        """
+        if not os.path.exists(path):
+            os.makedirs(path)
+        size = tuple(size or self.screen.get_size())
+        encoder = None
+        if video is not None:
+            if shutil.which('ffmpeg') is None:
+                raise RuntimeError("ffmpeg is required to export a video (or export an image sequence)")
+            size = (size[0] - size[0] % 2, size[1] - size[1] % 2)  # yuv420p requires even width and height
+            if min(size) <= 0:
+                raise ValueError(f"Video frames are too small: {size}")
+            encoder = subprocess.Popen(['ffmpeg', '-y', '-loglevel', 'error', '-f', 'rawvideo', '-pix_fmt', 'rgb24',
+                                        '-s', f'{size[0]}x{size[1]}', '-r', str(fps), '-i', '-',
+                                        '-pix_fmt', 'yuv420p', os.path.join(path, video)], stdin=subprocess.PIPE)
+        frame = pygame.Surface(size) if size != self.screen.get_size() else self.screen
+
+        state = env.reset()
+        previous, frames = None, 0
+        try:
+            for minute in range(minutes + 1):
+                if minute % frame_skip == 0:
+                    values = env.get_values()
+                    self.draw(values, previous)  # the screen keeps the rest of the previous frame
+                    previous = values
+                    if frame is not self.screen:
+                        pygame.transform.smoothscale(self.screen, size, frame)
+                    if encoder is not None:
+                        try:
+                            encoder.stdin.write(pygame.image.tobytes(frame, 'RGB'))
+                        except BrokenPipeError:  # ffmpeg exited - its exit code is reported below
+                            break
+                    else:
+                        pygame.image.save(frame, os.path.join(path, f'frame_{frames:06d}.{image_format}'))
+                    frames += 1
+                if minute < minutes:
+                    state = callback(model, env, state)
+        finally:
+            if encoder is not None:
+                try:
+                    encoder.stdin.close()
+                except BrokenPipeError:
+                    pass
+                encoder.wait()
+        if encoder is not None and encoder.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed with exit code {encoder.returncode} (video: {video})")
+        return frames